@@ -4,12 +4,12 @@ Solar-Surv: SMS System Demo
 Demonstrates offline vaccine monitoring with SMS alerts
 """
 
-import time
 import threading
-from datetime import datetime
+from sim_clock import SystemClock
 
 class SMSDemo:
-    def __init__(self):
+    def __init__(self, clock=None):
+        self.clock = clock or SystemClock()
         self.sensor_running = False
         self.receiver_running = False
         
@@ -29,7 +29,7 @@ class SMSDemo:
         for i, temp in enumerate(temperatures):
             battery = battery_levels[i]
             
-            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Reading sensors...")
+            print(f"\n[{self.clock.now().strftime('%H:%M:%S')}] Reading sensors...")
             print(f"Temperature: {temp}°C")
             print(f"Battery: {battery}V")
             
@@ -50,7 +50,7 @@ class SMSDemo:
                 print(f"📱 Sending SMS: BATTERY LOW: {battery}V - Device may shut down")
                 print("   SMS sent via GSM module to clinic phone")
             
-            time.sleep(3)
+            self.clock.sleep(3)
         
         print("\n🔴 EMERGENCY BUTTON PRESSED!")
         print("📱 Sending SMS: EMERGENCY ALERT: Manual emergency button pressed!")
@@ -68,7 +68,7 @@ class SMSDemo:
         print("Internet: Not required")
         print("=" * 50)
         
-        time.sleep(2)
+        self.clock.sleep(2)
         
         # Simulate receiving SMS alerts
         sms_messages = [
@@ -81,12 +81,12 @@ class SMSDemo:
         for i, message in enumerate(sms_messages, 1):
             print(f"\n📱 NEW SMS #{i}")
             print(f"From: Solar-Surv Device")
-            print(f"Time: {datetime.now().strftime('%H:%M:%S')}")
+            print(f"Time: {self.clock.now().strftime('%H:%M:%S')}")
             print(f"Message: {message}")
             print("🔔 Phone vibrating...")
             print("📞 Ring ring...")
             print("�� LED flashing...")
-            time.sleep(2)
+            self.clock.sleep(2)
         
         print("\n📱 SMS INBOX:")
         print("1. NEW | 14:32 | Solar-Surv | VACCINE ALERT: Temperature 8.9°C...")
@@ -109,7 +109,7 @@ class SMSDemo:
         sensor_thread.start()
         
         # Wait a bit, then start receiver
-        time.sleep(5)
+        self.clock.sleep(5)
         self.receiver_running = True
         receiver_thread = threading.Thread(target=self.simulate_receiver_phone)
         receiver_thread.start()
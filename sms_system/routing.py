@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Alert Routing and Escalation
+Works out who gets an alert SMS (clinic nurse -> district cold-chain
+officer -> regional manager) from on-call schedules, and escalates alerts
+nobody acknowledges
+"""
+
+import bisect
+import heapq
+import itertools
+from datetime import datetime
+
+MINUTES_PER_WEEK = 7 * 24 * 60
+DAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+
+# Escalation levels, in order
+NURSE = 'facility'
+DISTRICT_OFFICER = 'district'
+REGIONAL_MANAGER = 'region'
+LEVELS = [NURSE, DISTRICT_OFFICER, REGIONAL_MANAGER]
+
+
+def minute_of_week(timestamp):
+    """Local minute of the week (Monday 00:00 = 0) for an epoch timestamp"""
+    moment = datetime.fromtimestamp(timestamp)
+    return moment.weekday() * 24 * 60 + moment.hour * 60 + moment.minute
+
+
+def parse_shift_time(text):
+    """'mon 08:00' -> minute of week"""
+    day, clock = text.lower().split()
+    hour, minute = clock.split(':')
+    return DAYS[day[:3]] * 24 * 60 + int(hour) * 60 + int(minute)
+
+
+class OnCallSchedule:
+    """
+    Weekly on-call rota indexed by time. Shifts may overlap; they are cut
+    into non-overlapping segments up front so a lookup is one bisect.
+    """
+
+    def __init__(self, shifts=()):
+        self.shifts = []          # (start_minute, end_minute, contact)
+        self.boundaries = []      # segment start minutes, sorted
+        self.segments = []        # contacts on call in each segment
+        for start, end, contact in shifts:
+            self.add_shift(start, end, contact, rebuild=False)
+        self._build()
+
+    def add_shift(self, start, end, contact, rebuild=True):
+        """
+        Add a shift. start/end are minutes of the week or 'mon 08:00' style
+        strings; a shift that ends before it starts wraps past Sunday night.
+        """
+        if isinstance(start, str):
+            start = parse_shift_time(start)
+        if isinstance(end, str):
+            end = parse_shift_time(end)
+        if end <= start:
+            self.shifts.append((start, MINUTES_PER_WEEK, contact))
+            if end > 0:
+                self.shifts.append((0, end, contact))
+        else:
+            self.shifts.append((start, end, contact))
+        if rebuild:
+            self._build()
+
+    def add_daily(self, start, end, contact, days='mon tue wed thu fri sat sun'):
+        """Same hours on several days, e.g. add_daily('08:00', '17:00', nurse, 'mon tue')"""
+        for day in days.split():
+            if parse_shift_time(f"{day} {end}") <= parse_shift_time(f"{day} {start}"):
+                next_day = list(DAYS)[(DAYS[day[:3]] + 1) % 7]
+                shift_end = f"{next_day} {end}"
+            else:
+                shift_end = f"{day} {end}"
+            self.add_shift(f"{day} {start}", shift_end, contact, rebuild=False)
+        self._build()
+
+    def _build(self):
+        points = sorted({0, MINUTES_PER_WEEK}
+                        | {s for s, _, _ in self.shifts} | {e for _, e, _ in self.shifts})
+        self.boundaries = points[:-1]
+        self.segments = [[] for _ in self.boundaries]
+        for start, end, contact in self.shifts:
+            first = bisect.bisect_left(self.boundaries, start)
+            last = bisect.bisect_left(self.boundaries, end)
+            for i in range(first, last):
+                self.segments[i].append(contact)
+
+    def segment_index(self, minute):
+        return bisect.bisect_right(self.boundaries, minute % MINUTES_PER_WEEK) - 1
+
+    def on_call(self, timestamp):
+        """Contacts on call at an epoch timestamp"""
+        return self.segments[self.segment_index(minute_of_week(timestamp))]
+
+
+class RoutingEngine:
+    """
+    facilities: {facility: {'district': ..., 'region': ...}}
+    schedules:  {(level, key): OnCallSchedule}, where key is the facility,
+                district or region name for that level
+    """
+
+    def __init__(self, facilities=None, schedules=None):
+        self.facilities = dict(facilities or {})
+        self.schedules = dict(schedules or {})
+
+    def add_facility(self, facility, district, region):
+        self.facilities[facility] = {'district': district, 'region': region}
+
+    def schedule_for(self, level, key):
+        schedule = self.schedules.get((level, key))
+        if schedule is None:
+            schedule = self.schedules[(level, key)] = OnCallSchedule()
+        return schedule
+
+    def scope_key(self, facility, level):
+        if level == NURSE:
+            return facility
+        return self.facilities.get(facility, {}).get(level)
+
+    def recipients(self, facility, timestamp, level=NURSE):
+        """Contacts for one alert at one escalation level"""
+        schedule = self.schedules.get((level, self.scope_key(facility, level)))
+        return list(schedule.on_call(timestamp)) if schedule else []
+
+    def resolve_bulk(self, alerts, level=NURSE, timestamp=None):
+        """
+        Recipients for many alerts at once: {alert id: [contacts]}.
+        Uses each alert's own timestamp unless timestamp is given.
+        Alerts are grouped by schedule and time segment, so a district-wide
+        burst costs one lookup per facility and minute, not one per alert.
+        """
+        resolved = {}
+        lookups = {}
+        for alert in alerts:
+            schedule_key = (level, self.scope_key(alert['facility'], level))
+            minute = minute_of_week(alert['timestamp'] if timestamp is None else timestamp)
+            cache_key = (schedule_key, minute)
+            contacts = lookups.get(cache_key)
+            if contacts is None:
+                schedule = self.schedules.get(schedule_key)
+                contacts = (schedule.segments[schedule.segment_index(minute)]
+                            if schedule else [])
+                lookups[cache_key] = contacts
+            resolved[alert['id']] = list(contacts)
+        return resolved
+
+
+class EscalationManager:
+    """
+    Sends each alert to the facility level first. If nobody acknowledges it
+    within the level's timeout it goes to the next level, and so on. Once the
+    last level has been notified the alert is no longer tracked. If nobody is
+    on call at any level the alert goes to its fallback contact (or the
+    manager's default) rather than nowhere.
+    """
+
+    def __init__(self, engine, send, clock, timeouts=None, fallback_contact=None):
+        self.engine = engine
+        self.send = send          # f(contact, message, alert)
+        self.clock = clock
+        self.fallback_contact = fallback_contact
+        # Minutes to wait for an acknowledgement before escalating
+        self.timeouts = timeouts or {NURSE: 15, DISTRICT_OFFICER: 30, REGIONAL_MANAGER: None}
+        self.open_alerts = {}     # alert id -> alert
+        self.deadlines = []       # (deadline, alert id, level index)
+        self.ids = itertools.count(1)
+        self.escalations = 0
+
+    def raise_alerts(self, alerts):
+        """Open and notify many alerts; each gets an 'id' if it has none"""
+        for alert in alerts:
+            alert.setdefault('id', next(self.ids))
+            alert.setdefault('timestamp', self.clock.time())
+            alert['level'] = 0
+            alert['acknowledged_by'] = None
+            self.open_alerts[alert['id']] = alert
+        self._notify(alerts, 0)
+        return [alert['id'] for alert in alerts]
+
+    def raise_alert(self, facility, message, device_id=None, alert_type=None,
+                    fallback=None, on_send=None):
+        """
+        fallback: contact used if nobody is on call at any level
+        on_send:  optional f(contact), called for every SMS actually sent
+        """
+        alert = {'facility': facility, 'message': message, 'device_id': device_id,
+                 'type': alert_type, 'fallback': fallback, 'on_send': on_send}
+        return self.raise_alerts([alert])[0]
+
+    def acknowledge(self, alert_id, contact=None):
+        """Stop escalation for an alert; False if it is unknown or already closed"""
+        alert = self.open_alerts.pop(alert_id, None)
+        if alert is None:
+            return False
+        alert['acknowledged_by'] = contact
+        return True
+
+    def tick(self):
+        """Escalate every unacknowledged alert whose timer has run out"""
+        now = self.clock.time()
+        due = {}
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, alert_id, level_index = heapq.heappop(self.deadlines)
+            alert = self.open_alerts.get(alert_id)
+            if alert is None or alert['level'] != level_index:
+                continue  # acknowledged, or already moved on
+            alert['level'] = level_index + 1
+            due.setdefault(level_index + 1, []).append(alert)
+        for level_index, alerts in sorted(due.items()):
+            self.escalations += len(alerts)
+            self._notify(alerts, level_index)
+
+    def _notify(self, alerts, level_index):
+        level = LEVELS[level_index]
+        now = self.clock.time()
+        recipients = self.engine.resolve_bulk(alerts, level, now)
+        uncovered = []
+        for alert in alerts:
+            contacts = recipients[alert['id']]
+            if not contacts and level_index + 1 < len(LEVELS):
+                # Nobody on call at this level: go straight to the next one
+                alert['level'] = level_index + 1
+                uncovered.append(alert)
+                continue
+            if not contacts:
+                contacts = self._fallback(alert)
+            for contact in contacts:
+                self.send(contact, alert['message'], alert)
+                if alert.get('on_send'):
+                    alert['on_send'](contact)
+            timeout = self.timeouts.get(level)
+            if timeout is not None and level_index + 1 < len(LEVELS):
+                heapq.heappush(self.deadlines, (now + timeout * 60, alert['id'], level_index))
+            else:
+                self.open_alerts.pop(alert['id'], None)
+        if uncovered:
+            self._notify(uncovered, level_index + 1)
+
+    def _fallback(self, alert):
+        contact = alert.get('fallback') or self.fallback_contact
+        if contact is None:
+            print(f"❌ Alert {alert['id']} ({alert['facility']}) reached nobody: "
+                  f"no one on call and no fallback contact")
+            return []
+        print(f"⚠️ Nobody on call for alert {alert['id']} ({alert['facility']}), "
+              f"sending to fallback {contact.get('name', contact['phone'])}")
+        return [contact]
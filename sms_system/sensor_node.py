@@ -4,15 +4,30 @@ Solar-Surv: SMS-Based Sensor Node
 Simulates Arduino + GSM module sending temperature alerts via SMS
 """
 
-import time
 import random
-from datetime import datetime
 import json
+from sms_store import OUTBOX
+from sim_clock import SystemClock
+
+SENSOR_INTERVAL = 5  # seconds, matches SENSOR_INTERVAL in vaccine_monitor.ino
 
 class SMSSensorNode:
-    def __init__(self, device_id=1, phone_number="+1234567890"):
+    def __init__(self, device_id=1, phone_number="+1234567890", store=None,
+                 clock=None, rng=None, temperature_profile=None,
+                 battery_drain_per_hour=0.1, emergency_chance=0.05,
+                 facility=None, escalation=None):
         self.device_id = device_id
         self.phone_number = phone_number
+        self.store = store  # optional SMSStore used as the sent-messages outbox
+        self.clock = clock or SystemClock()
+        self.rng = rng or random.Random()
+        self.temperature_profile = temperature_profile  # optional f(timestamp) -> °C
+        self.battery_drain_per_hour = battery_drain_per_hour
+        self.emergency_chance = emergency_chance
+        self.sms_gateway = None  # optional f(phone_number, message, device_id, alert_type)
+        self.facility = facility
+        self.escalation = escalation  # optional routing.EscalationManager
+        self.started_at = self.clock.time()
         self.temp_min = 2.0
         self.temp_max = 8.0
         self.battery_voltage = 3.8
@@ -22,39 +37,60 @@ class SMSSensorNode:
         
     def read_temperature(self):
         """Simulate temperature reading (like potentiometer)"""
+        if self.temperature_profile is not None:
+            return round(self.temperature_profile(self.clock.time()), 1)
+        
         # Simulate different scenarios
-        current_time = int(time.time()) % 60
+        current_time = int(self.clock.time()) % 60
         
         if current_time < 20:
             # Normal temperature
-            return round(random.uniform(3.5, 6.5), 1)
+            return round(self.rng.uniform(3.5, 6.5), 1)
         elif current_time < 40:
             # Too hot
-            return round(random.uniform(8.5, 12.0), 1)
+            return round(self.rng.uniform(8.5, 12.0), 1)
         else:
             # Too cold
-            return round(random.uniform(-2.0, 1.5), 1)
+            return round(self.rng.uniform(-2.0, 1.5), 1)
     
     def check_battery(self):
         """Simulate battery voltage reading"""
         # Battery slowly drains over time
-        self.battery_voltage = max(3.0, 4.2 - (time.time() / 3600) * 0.1)
+        hours_running = (self.clock.time() - self.started_at) / 3600
+        self.battery_voltage = max(3.0, 4.2 - hours_running * self.battery_drain_per_hour)
         return round(self.battery_voltage, 1)
     
-    def send_sms(self, message):
+    def send_sms(self, message, alert_type=None):
         """Simulate sending SMS via GSM module"""
-        self.sms_count += 1
+        if self.store is not None:
+            self.store.add(message, sender=f"Device {self.device_id}",
+                           recipient=self.phone_number, direction=OUTBOX,
+                           device_id=self.device_id, alert_type=alert_type,
+                           timestamp=self.clock.now())
+        if self.escalation is not None:
+            # On-call routing picks the recipients; phone_number is the fallback
+            # when nobody is on call. Each SMS is counted as it actually goes out.
+            fallback = {'name': f"Device {self.device_id} default", 'phone': self.phone_number}
+            self.escalation.raise_alert(self.facility, message, self.device_id, alert_type,
+                                        fallback=fallback, on_send=self.count_sms)
+        else:
+            self.count_sms()
+            if self.sms_gateway is not None:
+                self.sms_gateway(self.phone_number, message, self.device_id, alert_type)
         cost = self.sms_count * self.sms_cost
         
         print(f"\n📱 SMS SENT to {self.phone_number}:")
         print(f"   {message}")
         print(f"   SMS Count: {self.sms_count} | Total Cost: ${cost:.2f}")
-        print(f"   Time: {datetime.now().strftime('%H:%M:%S')}")
+        print(f"   Time: {self.clock.now().strftime('%H:%M:%S')}")
         print("-" * 50)
         
         # In real implementation, this would use GSM module:
         # gsm.send_sms(phone_number, message)
     
+    def count_sms(self, contact=None):
+        self.sms_count += 1
+    
     def check_thresholds(self, temperature):
         """Check temperature against vaccine storage thresholds"""
         alerts = []
@@ -83,9 +119,40 @@ class SMSSensorNode:
     def simulate_emergency_button(self):
         """Simulate emergency button press"""
         message = "🚨 EMERGENCY ALERT: Manual emergency button pressed! Immediate attention required!"
-        self.send_sms(message)
+        self.send_sms(message, 'emergency')
         self.alert_sent = True
     
+    def sensor_step(self):
+        """One pass of the Arduino loop: read sensors, alert, maybe emergency"""
+        # Read sensors
+        temperature = self.read_temperature()
+        battery = self.check_battery()
+        
+        # Check thresholds
+        alerts = self.check_thresholds(temperature)
+        
+        # Send alerts via SMS
+        for alert in alerts:
+            if not self.alert_sent or alert['type'] != 'temperature_hot':
+                self.send_sms(alert['message'], alert['type'])
+                self.alert_sent = True
+        
+        # Reset alert flag for new temperature readings
+        if not alerts:
+            self.alert_sent = False
+        
+        # Display status
+        status = "SAFE" if not alerts else "ALERT"
+        print(f"[{self.clock.now().strftime('%H:%M:%S')}] "
+              f"Temp: {temperature}°C | Battery: {battery}V | Status: {status}")
+        
+        # Simulate emergency button (random chance)
+        if self.rng.random() < self.emergency_chance:  # 5% chance every cycle by default
+            print("\n🔴 EMERGENCY BUTTON PRESSED!")
+            self.simulate_emergency_button()
+        
+        return {'temperature': temperature, 'battery': battery, 'alerts': alerts}
+    
     def run_sensor_loop(self):
         """Main sensor loop - simulates Arduino operation"""
         print("=== Solar-Surv SMS Sensor Node ===")
@@ -99,34 +166,8 @@ class SMSSensorNode:
         
         try:
             while True:
-                # Read sensors
-                temperature = self.read_temperature()
-                battery = self.check_battery()
-                
-                # Check thresholds
-                alerts = self.check_thresholds(temperature)
-                
-                # Send alerts via SMS
-                for alert in alerts:
-                    if not self.alert_sent or alert['type'] != 'temperature_hot':
-                        self.send_sms(alert['message'])
-                        self.alert_sent = True
-                
-                # Reset alert flag for new temperature readings
-                if not alerts:
-                    self.alert_sent = False
-                
-                # Display status
-                status = "SAFE" if not alerts else "ALERT"
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] "
-                      f"Temp: {temperature}°C | Battery: {battery}V | Status: {status}")
-                
-                # Simulate emergency button (random chance)
-                if random.random() < 0.05:  # 5% chance every cycle
-                    print("\n🔴 EMERGENCY BUTTON PRESSED!")
-                    self.simulate_emergency_button()
-                
-                time.sleep(5)  # Read every 5 seconds
+                self.sensor_step()
+                self.clock.sleep(SENSOR_INTERVAL)
                 
         except KeyboardInterrupt:
             print(f"\n\nSensor node stopped.")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Clocks and Event Scheduler
+Lets sensors, receivers and demos run on real or simulated time
+"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime
+
+
+class SystemClock:
+    """Wall-clock time, the default for every component"""
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def now(self):
+        return datetime.now()
+
+
+class SimClock:
+    """
+    Virtual clock: sleep() returns immediately and just moves time forward.
+    Has the same time()/sleep()/now() interface as SystemClock.
+
+    Inside an EventScheduler callback sleep() does nothing: only the
+    scheduler moves time, so events stay in order. Schedule a follow-up
+    event for a delay that matters.
+    """
+
+    def __init__(self, start=None):
+        if start is None:
+            start = datetime(2024, 1, 1, 8, 0, 0)
+        self.current = start.timestamp() if isinstance(start, datetime) else float(start)
+        self.in_event = False
+
+    def time(self):
+        return self.current
+
+    def sleep(self, seconds):
+        if self.in_event:
+            return
+        self.current += max(0.0, seconds)
+
+    def now(self):
+        return datetime.fromtimestamp(self.current)
+
+    def advance_to(self, timestamp):
+        self.current = max(self.current, timestamp)
+
+
+class EventScheduler:
+    """
+    Discrete-event scheduler on top of a SimClock. Events run in time order
+    (ties in scheduling order), so a run is fully repeatable.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or SimClock()
+        self.queue = []                 # (time, event_id); ids increase, so ties run in order
+        self.events = {}                # event_id -> (callback, args)
+        self.counter = itertools.count()
+        self.processed = 0
+
+    def schedule_at(self, timestamp, callback, *args):
+        """Run callback(*args) at an absolute simulated time, returns an event id"""
+        event_id = next(self.counter)
+        self.events[event_id] = (callback, args)
+        heapq.heappush(self.queue, (timestamp, event_id))
+        return event_id
+
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) after delay seconds of simulated time"""
+        return self.schedule_at(self.clock.time() + delay, callback, *args)
+
+    def every(self, interval, callback, *args, start_delay=0.0):
+        """
+        Run callback(*args) every interval seconds. The callback can return
+        False to stop repeating.
+        """
+        def tick():
+            if callback(*args) is not False:
+                self.schedule(interval, tick)
+        return self.schedule(start_delay, tick)
+
+    def cancel(self, event_id):
+        self.events.pop(event_id, None)
+
+    def run_until(self, timestamp):
+        """Process every event up to timestamp, then park the clock there"""
+        while self.queue and self.queue[0][0] <= timestamp:
+            event_time, event_id = heapq.heappop(self.queue)
+            event = self.events.pop(event_id, None)
+            if event is None:
+                continue  # cancelled
+            self.clock.advance_to(event_time)
+            callback, args = event
+            self.clock.in_event = True
+            try:
+                callback(*args)
+            finally:
+                self.clock.in_event = False
+            self.processed += 1
+        self.clock.advance_to(timestamp)
+
+    def run_for(self, seconds):
+        self.run_until(self.clock.time() + seconds)
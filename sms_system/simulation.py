@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Simulated-Time Pipeline
+Runs sensor nodes -> GSM network -> clinic phone on a virtual clock,
+so days of multi-device operation take seconds and repeat exactly per seed
+"""
+
+import contextlib
+import os
+import random
+from datetime import datetime, timedelta
+
+from sim_clock import SimClock, EventScheduler
+from sensor_node import SMSSensorNode, SENSOR_INTERVAL
+from sms_receiver import SMSReceiver
+from sms_store import SMSStore
+from routing import EscalationManager
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class PipelineSimulation:
+    def __init__(self, num_devices=3, seed=42, start=None,
+                 phone_number="+1234567890", temperature_profile=None,
+                 routing=None, facilities=None):
+        self.clock = SimClock(start or datetime(2024, 1, 1, 8, 0, 0))
+        self.scheduler = EventScheduler(self.clock)
+        self.seed = seed
+        self.network_rng = random.Random(seed)
+        self.start_time = self.clock.time()
+
+        self.phone = SMSReceiver(phone_number, store=SMSStore(), clock=self.clock)
+        self.phones = {phone_number: self.phone}
+        self.sensors = []
+
+        # Optional on-call routing: alerts go to whoever is on call instead
+        # of the single clinic phone, and escalate every minute if unanswered
+        self.escalation = None
+        if routing is not None:
+            self.escalation = EscalationManager(routing, self.send_to_contact, self.clock)
+            self.scheduler.every(60, self.escalation.tick)
+        self.readings = 0
+        self.alert_readings = 0
+
+        for device_id in range(1, num_devices + 1):
+            profile = temperature_profile(device_id) if temperature_profile else None
+            sensor = SMSSensorNode(device_id, phone_number, store=SMSStore(),
+                                   clock=self.clock,
+                                   rng=random.Random(f"{seed}-{device_id}"),
+                                   temperature_profile=profile,
+                                   battery_drain_per_hour=0.002,
+                                   emergency_chance=0.0,
+                                   facility=(facilities or {}).get(device_id),
+                                   escalation=self.escalation)
+            sensor.sms_gateway = self.send_over_gsm
+            self.sensors.append(sensor)
+            # Stagger devices so they do not all read in the same instant
+            self.scheduler.every(SENSOR_INTERVAL, self.sensor_tick, sensor,
+                                 start_delay=device_id * 0.1)
+
+    def sensor_tick(self, sensor):
+        result = sensor.sensor_step()
+        self.readings += 1
+        if result['alerts']:
+            self.alert_readings += 1
+
+    def send_over_gsm(self, phone_number, message, device_id, alert_type):
+        """Deliver an SMS to a phone after a random 2G network delay"""
+        delay = self.network_rng.uniform(2.0, 30.0)
+        self.scheduler.schedule(delay, self.phone_for(phone_number).receive_sms, message,
+                                f"Device {device_id}", device_id, alert_type)
+
+    def send_to_contact(self, contact, message, alert):
+        self.send_over_gsm(contact['phone'], message, alert['device_id'], alert['type'])
+
+    def phone_for(self, phone_number):
+        if phone_number not in self.phones:
+            self.phones[phone_number] = SMSReceiver(phone_number, store=SMSStore(),
+                                                    clock=self.clock)
+        return self.phones[phone_number]
+
+    def run(self, seconds, quiet=True):
+        """Advance the simulation; console output is discarded when quiet"""
+        if not quiet:
+            self.scheduler.run_for(seconds)
+            return self.summary()
+        with open(os.devnull, 'w', encoding='utf-8') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                self.scheduler.run_for(seconds)
+        return self.summary()
+
+    def summary(self):
+        inbox = self.phone.store
+        alert_types = {alert_type: len(ids) for alert_type, ids
+                       in sorted(inbox.by_alert_type.items())}
+        first = inbox.query(page_size=1, page=inbox.count()) if inbox.count() else None
+        return {
+            'simulated_hours': round((self.clock.time() - self.start_time) / HOUR, 2),
+            'events': self.scheduler.processed,
+            'readings': self.readings,
+            'alert_readings': self.alert_readings,
+            'sms_sent': sum(sensor.sms_count for sensor in self.sensors),
+            'sms_received': inbox.count(),
+            'sms_cost': round(sum(s.sms_count * s.sms_cost for s in self.sensors), 2),
+            'alerts_by_type': alert_types,
+            'sms_by_phone': {number: phone.store.count()
+                             for number, phone in sorted(self.phones.items())},
+            'escalations': self.escalation.escalations if self.escalation else 0,
+            'first_alert': first['items'][0]['timestamp'].isoformat() if first else None,
+        }
+
+
+# ----------------------------------------------------------------------
+# Scenarios (see docs/demo_scenarios.md)
+
+def overnight_power_loss(seed=42, num_devices=3, outage_start_hour=20, outage_hours=10):
+    """
+    Mains power to the fridges is cut overnight. The fridge warms about
+    0.6°C/hour towards room temperature, then cools back once power returns.
+    """
+    start = datetime(2024, 1, 1, 8, 0, 0)
+    outage_start = (start + timedelta(hours=outage_start_hour - 8)).timestamp()
+    outage_end = outage_start + outage_hours * HOUR
+
+    def profile(device_id):
+        base = 4.5 + device_id * 0.2
+        noise = random.Random(f"{seed}-noise-{device_id}")
+
+        def temperature(now):
+            if now < outage_start:
+                warmed = 0.0
+            elif now < outage_end:
+                warmed = (now - outage_start) / HOUR * 0.6
+            else:
+                peak = outage_hours * 0.6
+                warmed = max(0.0, peak - (now - outage_end) / HOUR * 2.0)
+            return min(25.0, base + warmed) + noise.uniform(-0.2, 0.2)
+        return temperature
+
+    sim = PipelineSimulation(num_devices, seed, start, temperature_profile=profile)
+    return sim.run(DAY)
+
+
+def week_long_drift(seed=42, num_devices=3, drift_per_day=1.2):
+    """A thermostat slowly drifts warmer until the fridge leaves the safe range"""
+    start = datetime(2024, 1, 1, 8, 0, 0)
+    start_ts = start.timestamp()
+
+    def profile(device_id):
+        base = 4.0 + device_id * 0.3
+        noise = random.Random(f"{seed}-noise-{device_id}")
+
+        def temperature(now):
+            days = (now - start_ts) / DAY
+            return base + days * drift_per_day + noise.uniform(-0.3, 0.3)
+        return temperature
+
+    sim = PipelineSimulation(num_devices, seed, start, temperature_profile=profile)
+    return sim.run(7 * DAY)
+
+
+def main():
+    print("⏱️ Solar-Surv Simulated-Time Scenarios")
+    print("=" * 50)
+    for name, scenario in (("Overnight power loss", overnight_power_loss),
+                           ("Week-long thermostat drift", week_long_drift)):
+        print(f"\n{name}:")
+        for key, value in scenario().items():
+            print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,27 +4,31 @@ Solar-Surv: SMS Receiver Simulation
 Simulates receiving SMS alerts on a button phone
 """
 
+import os
 import time
 import random
-from datetime import datetime
+from sms_store import SMSStore, INBOX
+from sim_clock import SystemClock
+
+INBOX_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sms_inbox.log")
+# The phone's own inbox keeps about what a button phone does. The shared
+# sms_inbox.log is the dashboard's full history and is not capped.
+INBOX_MAX_MESSAGES = 200
 
 class SMSReceiver:
-    def __init__(self, phone_number="+1234567890"):
+    def __init__(self, phone_number="+1234567890", store=None, clock=None):
         self.phone_number = phone_number
-        self.received_sms = []
+        self.clock = clock or SystemClock()
+        self.store = store if store is not None else SMSStore(max_messages=INBOX_MAX_MESSAGES)
+        self.inbox_view = []  # message ids currently shown, by position
         self.alert_count = 0
         
-    def receive_sms(self, message, sender="Solar-Surv"):
+    def receive_sms(self, message, sender="Solar-Surv", device_id=None, alert_type=None):
         """Simulate receiving SMS on button phone"""
-        timestamp = datetime.now()
-        sms = {
-            'timestamp': timestamp,
-            'sender': sender,
-            'message': message,
-            'read': False
-        }
-        
-        self.received_sms.append(sms)
+        timestamp = self.clock.now()
+        self.store.add(message, sender=sender, recipient=self.phone_number,
+                       direction=INBOX, device_id=device_id,
+                       alert_type=alert_type, timestamp=timestamp)
         self.alert_count += 1
         
         # Simulate phone notification
@@ -43,29 +47,47 @@ class SMSReceiver:
         print("🔔 Phone vibrating...")
         print("📞 Ring ring...")
         print("💡 LED flashing...")
-        time.sleep(1)
+        self.clock.sleep(1)
     
     def show_sms_inbox(self):
         """Show SMS inbox (like on button phone)"""
         print(f"\n📱 SMS INBOX - {self.phone_number}")
         print("=" * 40)
         
-        if not self.received_sms:
+        latest = self.store.latest(10)  # Show last 10
+        self.inbox_view = [sms['id'] for sms in latest]
+        if not latest:
             print("No messages")
             return
         
-        for i, sms in enumerate(self.received_sms[-10:], 1):  # Show last 10
+        for i, sms in enumerate(latest, 1):
             status = "NEW" if not sms['read'] else "READ"
             print(f"{i}. {status} | {sms['timestamp'].strftime('%H:%M')} | {sms['sender']}")
             print(f"   {sms['message'][:50]}...")
             print()
+        print(f"{self.store.unread_count()} unread of {self.store.count(INBOX)} messages")
+    
+    def message_at(self, index):
+        """Look up the SMS shown at a position of the last inbox listing"""
+        if 0 <= index < len(self.inbox_view):
+            return self.store.get(self.inbox_view[index])
+        return None
     
     def mark_as_read(self, index):
         """Mark SMS as read"""
-        if 0 <= index < len(self.received_sms):
-            self.received_sms[index]['read'] = True
+        sms = self.message_at(index)
+        if sms is not None:
+            self.store.mark_read(sms['id'])
             print(f"✅ SMS {index + 1} marked as read")
     
+    def delete_sms(self, index):
+        """Delete SMS shown at a position of the last inbox listing"""
+        sms = self.message_at(index)
+        if sms is not None:
+            self.store.delete(sms['id'])
+            self.inbox_view[index] = None
+            print(f"✅ SMS {index + 1} deleted")
+    
     def simulate_button_phone_interface(self):
         """Simulate button phone SMS interface"""
         print("�� Button Phone SMS Interface")
@@ -83,10 +105,10 @@ class SMSReceiver:
                     self.show_sms_inbox()
                 elif choice == "2":
                     self.show_sms_inbox()
-                    if self.received_sms:
+                    if self.inbox_view:
                         msg_num = int(input("Enter message number to read: ")) - 1
-                        if 0 <= msg_num < len(self.received_sms):
-                            sms = self.received_sms[msg_num]
+                        sms = self.message_at(msg_num)
+                        if sms is not None:
                             print(f"\n�� MESSAGE {msg_num + 1}:")
                             print(f"From: {sms['sender']}")
                             print(f"Time: {sms['timestamp'].strftime('%H:%M:%S')}")
@@ -94,11 +116,9 @@ class SMSReceiver:
                             self.mark_as_read(msg_num)
                 elif choice == "3":
                     self.show_sms_inbox()
-                    if self.received_sms:
+                    if self.inbox_view:
                         msg_num = int(input("Enter message number to delete: ")) - 1
-                        if 0 <= msg_num < len(self.received_sms):
-                            del self.received_sms[msg_num]
-                            print(f"✅ SMS {msg_num + 1} deleted")
+                        self.delete_sms(msg_num)
                 elif choice == "4":
                     print("Goodbye!")
                     break
@@ -117,7 +137,7 @@ def main():
     print()
     
     # Create receiver
-    receiver = SMSReceiver("+1234567890")
+    receiver = SMSReceiver("+1234567890", SMSStore(INBOX_LOG_PATH))
     
     # Simulate receiving some alerts
     print("Simulating incoming SMS alerts...")
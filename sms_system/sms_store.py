@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: SMS Message Store
+Indexed inbox/outbox store with an append-only log on disk
+"""
+
+import bisect
+import json
+import os
+from collections import deque
+from datetime import datetime
+
+INBOX = 'inbox'
+OUTBOX = 'outbox'
+
+
+def classify_alert(message):
+    """Work out the alert type from the SMS text sent by the sensor node"""
+    text = message.upper()
+    if 'TOO HOT' in text:
+        return 'temperature_hot'
+    if 'TOO COLD' in text:
+        return 'temperature_cold'
+    if 'BATTERY LOW' in text:
+        return 'battery_low'
+    if 'EMERGENCY' in text:
+        return 'emergency'
+    return 'other'
+
+
+class SMSStore:
+    """
+    Keeps every SMS by id with secondary indexes so lookups, read-state
+    changes and deletes never scan the whole inbox.
+
+    Every change is appended to a JSON-lines log; the log is rewritten
+    (compacted) once dead entries outnumber live messages.
+    """
+
+    def __init__(self, log_path=None, recent_size=50, compact_ratio=2.0,
+                 readonly=False, max_messages=None):
+        self.log_path = log_path
+        self.readonly = readonly
+        self.max_messages = max_messages  # oldest messages are dropped beyond this
+        self.recent_size = recent_size
+        self.compact_ratio = compact_ratio
+
+        self.messages = {}            # id -> sms dict
+        self.next_id = 1
+        self.recent = {INBOX: deque(maxlen=recent_size),
+                       OUTBOX: deque(maxlen=recent_size)}
+        self.by_device = {}           # device_id -> set of ids
+        self.by_alert_type = {}       # alert_type -> set of ids
+        self.unread = set()
+        self.direction_counts = {INBOX: 0, OUTBOX: 0}
+        self.time_index = []          # sorted (timestamp, id), lazily cleaned
+        self._evicted_upto = 0
+        self.log_entries = 0
+
+        self._log = None
+        self._offset = 0
+        self._inode = None
+        if self.log_path:
+            self._load()
+            if not self.readonly:
+                self._log = open(self.log_path, 'a', encoding='utf-8')
+
+    def _reset(self):
+        self.messages.clear()
+        for ring in self.recent.values():
+            ring.clear()
+        self.by_device.clear()
+        self.by_alert_type.clear()
+        self.unread.clear()
+        self.direction_counts = {INBOX: 0, OUTBOX: 0}
+        self.time_index = []
+        self._evicted_upto = 0
+        self.log_entries = 0
+        self._offset = 0
+
+    # ------------------------------------------------------------------
+    # Mutations
+
+    def add(self, message, sender='Solar-Surv', recipient=None, direction=INBOX,
+            device_id=None, alert_type=None, timestamp=None):
+        """Store a new SMS and return its id"""
+        sms = {
+            'id': self.next_id,
+            'timestamp': timestamp or datetime.now(),
+            'direction': direction,
+            'sender': sender,
+            'recipient': recipient,
+            'device_id': device_id,
+            'alert_type': alert_type or classify_alert(message),
+            'message': message,
+            'read': direction == OUTBOX,
+        }
+        self._insert(sms)
+        self._append({'op': 'add', 'sms': self.serialize(sms)})
+        if self.max_messages is not None and len(self.messages) > self.max_messages:
+            self._evict_oldest()
+        return sms['id']
+
+    def _evict_oldest(self):
+        """Apply the retention limit, dropping the oldest messages first"""
+        # _evicted_upto skips the already-dead front of the time index
+        while (len(self.messages) > self.max_messages
+               and self._evicted_upto < len(self.time_index)):
+            sms_id = self.time_index[self._evicted_upto][1]
+            self._evicted_upto += 1
+            if sms_id in self.messages:
+                self._remove(sms_id)
+                self._append({'op': 'delete', 'id': sms_id})
+        self._maybe_compact()
+
+    def mark_read(self, sms_id, read=True):
+        """Set the read flag of an SMS, returns False if it does not exist"""
+        sms = self.messages.get(sms_id)
+        if sms is None:
+            return False
+        self._set_read(sms, read)
+        self._append({'op': 'read', 'id': sms_id, 'read': read})
+        self._maybe_compact()
+        return True
+
+    def delete(self, sms_id):
+        """Delete an SMS by id, returns False if it does not exist"""
+        if sms_id not in self.messages:
+            return False
+        self._remove(sms_id)
+        self._append({'op': 'delete', 'id': sms_id})
+        self._maybe_compact()
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def get(self, sms_id):
+        return self.messages.get(sms_id)
+
+    def latest(self, count=10, direction=INBOX):
+        """Most recent messages, oldest first (like a phone inbox page)"""
+        ids = [i for i in self.recent[direction] if i in self.messages]
+        if len(ids) < min(count, self.count(direction)):
+            # Ring buffer lost entries to deletes, fall back to the time index
+            return self.query(direction=direction, page_size=count)['items'][::-1]
+        return [self.messages[i] for i in ids[-count:]]
+
+    def count(self, direction=None):
+        if direction is None:
+            return len(self.messages)
+        return self.direction_counts[direction]
+
+    def unread_count(self):
+        return len(self.unread)
+
+    def query(self, device_id=None, alert_type=None, read=None, direction=None,
+              since=None, until=None, page=1, page_size=20):
+        """
+        Filter messages using the indexes and return one page, newest first.
+        since/until are datetimes (inclusive/exclusive); timezone-aware ones
+        are converted to local time like the stored timestamps.
+        Raises ValueError for an unknown direction.
+        """
+        if direction not in (None, INBOX, OUTBOX):
+            raise ValueError(f"direction must be {INBOX!r} or {OUTBOX!r}, not {direction!r}")
+        since = self._local(since)
+        until = self._local(until)
+        page = max(1, int(page))
+        page_size = max(1, min(int(page_size), 500))
+        start = (page - 1) * page_size
+
+        if device_id is None and alert_type is None and read is None:
+            # Plain inbox/outbox paging: walk the time index from the newest end
+            items, total = self._page_by_time(direction, since, until,
+                                              start, page_size)
+        else:
+            ids = self._ids_for(device_id, alert_type, read, direction, since, until)
+            matched = sorted(ids, key=lambda i: (self.messages[i]['timestamp'], i),
+                             reverse=True)
+            items = [self.messages[i] for i in matched[start:start + page_size]]
+            total = len(matched)
+
+        return {
+            'items': items,
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'pages': (total + page_size - 1) // page_size,
+        }
+
+    @staticmethod
+    def _local(moment):
+        """Stored timestamps are naive local time; bring aware datetimes in line"""
+        if moment is not None and moment.tzinfo is not None:
+            return moment.astimezone().replace(tzinfo=None)
+        return moment
+
+    def _time_bounds(self, since, until):
+        lo = 0 if since is None else bisect.bisect_left(self.time_index, (since, 0))
+        hi = (len(self.time_index) if until is None
+              else bisect.bisect_left(self.time_index, (until, 0)))
+        return lo, hi
+
+    def _page_by_time(self, direction, since, until, start, page_size):
+        lo, hi = self._time_bounds(since, until)
+        known_total = since is None and until is None
+        total = self.count(direction) if known_total else 0
+
+        items = []
+        seen = 0
+        for pos in range(hi - 1, lo - 1, -1):
+            sms = self.messages.get(self.time_index[pos][1])
+            if sms is None or (direction is not None and sms['direction'] != direction):
+                continue
+            if start <= seen < start + page_size:
+                items.append(sms)
+            seen += 1
+            if known_total and len(items) == page_size:
+                break
+        if not known_total:
+            total = seen
+        return items, total
+
+    def _ids_for(self, device_id=None, alert_type=None, read=None, direction=None,
+                 since=None, until=None):
+        candidates = []
+        if device_id is not None:
+            candidates.append(self.by_device.get(device_id, set()))
+        if alert_type is not None:
+            candidates.append(self.by_alert_type.get(alert_type, set()))
+        if read is False:
+            candidates.append(self.unread)
+
+        if since is not None or until is not None:
+            lo, hi = self._time_bounds(since, until)
+            candidates.append({i for _, i in self.time_index[lo:hi]
+                               if i in self.messages})
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = set(candidates[0]).intersection(*candidates[1:])
+        else:
+            ids = self.messages.keys()
+
+        for sms_id in ids:
+            sms = self.messages[sms_id]
+            if direction is not None and sms['direction'] != direction:
+                continue
+            if read is True and not sms['read']:
+                continue
+            yield sms_id
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+
+    def _insert(self, sms):
+        sms_id = sms['id']
+        self.messages[sms_id] = sms
+        self.next_id = max(self.next_id, sms_id + 1)
+        self.recent[sms['direction']].append(sms_id)
+        self.direction_counts[sms['direction']] += 1
+        self.by_device.setdefault(sms['device_id'], set()).add(sms_id)
+        self.by_alert_type.setdefault(sms['alert_type'], set()).add(sms_id)
+        if not sms['read']:
+            self.unread.add(sms_id)
+
+        key = (sms['timestamp'], sms_id)
+        if not self.time_index or key >= self.time_index[-1]:
+            self.time_index.append(key)
+        else:
+            position = bisect.bisect(self.time_index, key)
+            self.time_index.insert(position, key)
+            self._evicted_upto = min(self._evicted_upto, position)
+
+    def _set_read(self, sms, read):
+        sms['read'] = read
+        if read:
+            self.unread.discard(sms['id'])
+        else:
+            self.unread.add(sms['id'])
+
+    def _remove(self, sms_id):
+        sms = self.messages.pop(sms_id)
+        self.direction_counts[sms['direction']] -= 1
+        self._discard(self.by_device, sms['device_id'], sms_id)
+        self._discard(self.by_alert_type, sms['alert_type'], sms_id)
+        self.unread.discard(sms_id)
+        # time_index and recent are cleaned lazily (on compaction / lookup)
+
+    @staticmethod
+    def _discard(index, key, sms_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(sms_id)
+            if not ids:
+                del index[key]
+
+    # ------------------------------------------------------------------
+    # Persistence
+
+    @staticmethod
+    def serialize(sms):
+        record = dict(sms)
+        record['timestamp'] = sms['timestamp'].isoformat()
+        return record
+
+    @staticmethod
+    def deserialize(record):
+        sms = dict(record)
+        sms['timestamp'] = datetime.fromisoformat(record['timestamp'])
+        return sms
+
+    def _append(self, entry):
+        if self._log is None:
+            return
+        self._log.write(json.dumps(entry) + '\n')
+        self._log.flush()
+        self.log_entries += 1
+
+    def _load(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn write at the end of the log (power cut)
+                    break
+                self._offset += len(line)
+                self._apply(line)
+        if not self.readonly and os.path.getsize(self.log_path) > self._offset:
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(self._offset)
+
+    def _apply(self, line):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return
+        self.log_entries += 1
+        op = entry.get('op')
+        if op == 'add':
+            self._insert(self.deserialize(entry['sms']))
+        elif op == 'read' and entry['id'] in self.messages:
+            self._set_read(self.messages[entry['id']], entry['read'])
+        elif op == 'delete' and entry['id'] in self.messages:
+            self._remove(entry['id'])
+        elif op == 'meta':
+            self.next_id = max(self.next_id, entry['next_id'])
+
+    def refresh(self):
+        """
+        Pick up entries appended by another process (read-only stores).
+        Reloads from scratch if the log was compacted underneath us.
+        """
+        if not self.readonly or not self.log_path:
+            return
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._reset()
+        if stat.st_size != self._offset:
+            self._load()
+
+    def _maybe_compact(self):
+        if self._log is None:
+            # In-memory store: only the lazily cleaned time index can grow
+            if len(self.time_index) > max(100, len(self.messages) * self.compact_ratio):
+                self.compact()
+            return
+        if self.log_entries > max(100, len(self.messages) * self.compact_ratio):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with only the live messages"""
+        self.time_index = [k for k in self.time_index if k[1] in self.messages]
+        self._evicted_upto = 0
+        for direction, ring in self.recent.items():
+            live = [i for i in ring if i in self.messages]
+            self.recent[direction] = deque(live, maxlen=self.recent_size)
+
+        if self._log is None:
+            return
+        tmp_path = self.log_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # Deleted messages leave no record, so keep ids from being reused
+            f.write(json.dumps({'op': 'meta', 'next_id': self.next_id}) + '\n')
+            for _, sms_id in self.time_index:
+                f.write(json.dumps({'op': 'add',
+                                    'sms': self.serialize(self.messages[sms_id])}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._log.close()
+        os.replace(tmp_path, self.log_path)
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self.log_entries = len(self.messages) + 1
+        self._offset = os.path.getsize(self.log_path)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
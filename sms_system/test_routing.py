@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: routing and escalation checks
+Run with: python -m pytest test_routing.py
+"""
+
+from datetime import datetime
+
+from routing import RoutingEngine, EscalationManager, NURSE, DISTRICT_OFFICER
+from sensor_node import SMSSensorNode
+from sim_clock import SimClock
+
+NURSE_CONTACT = {'name': 'Nurse', 'phone': '+100'}
+OFFICER_CONTACT = {'name': 'Officer', 'phone': '+200'}
+
+
+def make_manager(clock, fallback_contact=None):
+    engine = RoutingEngine({'Clinic A': {'district': 'North', 'region': 'Coast'}})
+    engine.schedule_for(NURSE, 'Clinic A').add_daily('08:00', '17:00', NURSE_CONTACT)
+    sent = []
+    manager = EscalationManager(engine, lambda contact, message, alert: sent.append(contact['phone']),
+                                clock, fallback_contact=fallback_contact)
+    return engine, manager, sent
+
+
+def test_on_call_nurse_gets_alert():
+    clock = SimClock(datetime(2024, 1, 1, 9, 0))  # Monday morning
+    _, manager, sent = make_manager(clock)
+    manager.raise_alert('Clinic A', 'too hot')
+    assert sent == ['+100']
+
+
+def test_unacknowledged_alert_escalates():
+    clock = SimClock(datetime(2024, 1, 1, 9, 0))
+    engine, manager, sent = make_manager(clock)
+    engine.schedule_for(DISTRICT_OFFICER, 'North').add_daily('00:00', '00:00', OFFICER_CONTACT)
+    alert_id = manager.raise_alert('Clinic A', 'too hot')
+    clock.advance_to(clock.time() + 16 * 60)
+    manager.tick()
+    assert sent == ['+100', '+200']
+    assert manager.acknowledge(alert_id, OFFICER_CONTACT)
+
+
+def test_nobody_on_call_uses_fallback():
+    clock = SimClock(datetime(2024, 1, 1, 20, 0))  # after the nurse's shift
+    _, manager, sent = make_manager(clock)
+    manager.raise_alert('Clinic A', 'too hot', fallback={'phone': '+999'})
+    assert sent == ['+999']
+
+    _, manager, sent = make_manager(clock, fallback_contact={'phone': '+555'})
+    manager.raise_alert(None, 'too hot')
+    assert sent == ['+555']
+
+
+def test_sensor_counts_sms_actually_sent():
+    clock = SimClock(datetime(2024, 1, 1, 20, 0))
+    _, manager, sent = make_manager(clock)
+    sensor = SMSSensorNode(1, '+999', clock=clock, escalation=manager, facility='Clinic A')
+    sensor.send_sms('too hot', 'temperature_hot')
+    assert sent == ['+999']
+    assert sensor.sms_count == 1
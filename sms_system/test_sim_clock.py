@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: simulated clock checks
+Run with: python -m pytest test_sim_clock.py
+"""
+
+from sim_clock import SimClock, EventScheduler
+from simulation import PipelineSimulation, HOUR
+from sensor_node import SENSOR_INTERVAL
+
+
+def test_sleep_inside_an_event_does_not_move_time():
+    clock = SimClock(0)
+    scheduler = EventScheduler(clock)
+    ticks = []
+
+    def tick():
+        ticks.append(clock.time())
+        clock.sleep(1)
+
+    scheduler.every(5, tick)
+    scheduler.run_for(20)
+    assert ticks == [0, 5, 10, 15, 20]
+    clock.sleep(3)
+    assert clock.time() == 23
+
+
+def test_every_device_reads_on_schedule():
+    sim = PipelineSimulation(num_devices=3, temperature_profile=lambda device_id: (lambda now: 9.0))
+    summary = sim.run(6 * HOUR)
+    assert summary['readings'] == 3 * 6 * HOUR // SENSOR_INTERVAL
+    assert summary['sms_received'] > 0
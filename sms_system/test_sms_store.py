@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: SMS store checks
+Run with: python -m pytest test_sms_store.py
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sms_store import SMSStore, INBOX, OUTBOX
+
+START = datetime(2024, 1, 1, 8, 0, 0)
+
+
+def fill(store, count):
+    return [store.add(f"TOO HOT #{i}", device_id=i % 3,
+                      timestamp=START + timedelta(minutes=i)) for i in range(count)]
+
+
+def test_log_replays_after_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sms.log')
+        store = SMSStore(path)
+        ids = fill(store, 10)
+        store.mark_read(ids[0])
+        store.delete(ids[1])
+        store.close()
+
+        reopened = SMSStore(path)
+        assert reopened.count() == 9
+        assert reopened.get(ids[0])['read']
+        assert reopened.get(ids[1]) is None
+        assert reopened.unread_count() == 8
+        assert reopened.add("TOO COLD") == ids[-1] + 1
+
+
+def test_torn_tail_is_dropped():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sms.log')
+        store = SMSStore(path)
+        fill(store, 3)
+        store.close()
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "add", "sms": {"id": 4')  # power cut mid-write
+
+        reopened = SMSStore(path)
+        assert reopened.count() == 3
+        reopened.add("TOO HOT again")
+        reopened.close()
+        assert SMSStore(path).count() == 4
+
+
+def test_read_toggles_compact_the_log():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sms.log')
+        store = SMSStore(path)
+        ids = fill(store, 101)
+        for i in range(3000):
+            store.mark_read(ids[i % len(ids)], read=bool(i % 2))
+        store.close()
+        with open(path, encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+        assert lines <= 101 * store.compact_ratio + 1
+
+
+def test_ids_are_not_reused_after_compaction():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sms.log')
+        store = SMSStore(path)
+        ids = fill(store, 3)
+        store.delete(ids[-1])
+        store.compact()
+        store.close()
+
+        reopened = SMSStore(path)
+        assert reopened.count() == 2
+        assert reopened.add("TOO COLD") == ids[-1] + 1
+
+
+def test_retention_drops_oldest():
+    store = SMSStore(max_messages=5)
+    ids = fill(store, 12)
+    assert store.count() == 5
+    assert [sms['id'] for sms in store.latest(5)] == ids[-5:]
+
+
+def test_query_accepts_timezone_aware_bounds():
+    store = SMSStore()
+    fill(store, 10)
+    since = (START + timedelta(minutes=5)).astimezone(timezone.utc)
+    assert store.query(since=since)['total'] == 5
+    assert store.query(since=since, device_id=0)['total'] == 2
+
+
+def test_query_rejects_unknown_direction():
+    store = SMSStore()
+    fill(store, 2)
+    assert store.query(direction=OUTBOX)['total'] == 0
+    assert store.query(direction=INBOX)['total'] == 2
+    with pytest.raises(ValueError):
+        store.query(direction='foo')
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Fleet Summary
+Per-facility and per-region aggregates kept up to date as readings and
+alerts arrive, served as a cached JSON endpoint with ETag support
+"""
+
+import heapq
+import json
+import threading
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEMP_MIN = 2.0
+TEMP_MAX = 8.0
+SAFE_MIDPOINT = (TEMP_MIN + TEMP_MAX) / 2
+
+IN_RANGE = "in_range"
+EXCURSION = "excursion"
+OFFLINE = "offline"
+
+
+class GroupStats:
+    """Counters for one facility or region"""
+
+    def __init__(self):
+        self.devices = 0
+        self.status_counts = {IN_RANGE: 0, EXCURSION: 0, OFFLINE: 0}
+        self.open_alerts = 0
+        self.sms_today = 0
+        self.members = set()
+        # Lazy max-heap of (-distance from safe midpoint, deviceId, version);
+        # entries whose version is stale are skipped when read
+        self.worst = []
+
+    def to_dict(self, devices, sms_cost):
+        worst = self.worst_device(devices)
+        return {
+            "devices": self.devices,
+            "inRange": self.status_counts[IN_RANGE],
+            "excursion": self.status_counts[EXCURSION],
+            "offline": self.status_counts[OFFLINE],
+            "openAlerts": self.open_alerts,
+            "smsToday": self.sms_today,
+            "costToday": round(self.sms_today * sms_cost, 2),
+            "worstTemperature": worst["temperature"] if worst else None,
+            "worstDevice": worst["deviceId"] if worst else None,
+        }
+
+    def worst_device(self, devices):
+        while self.worst:
+            _, device_id, version = self.worst[0]
+            device = devices.get(device_id)
+            if device and device["version"] == version and device["status"] != OFFLINE:
+                return device
+            heapq.heappop(self.worst)
+        return None
+
+    def push_worst(self, device, devices):
+        heapq.heappush(self.worst, (-abs(device["temperature"] - SAFE_MIDPOINT),
+                                    device["deviceId"], device["version"]))
+        # Stale entries only leave from the top; rebuild before they pile up
+        if len(self.worst) > 4 * max(self.devices, 16):
+            self.worst = [(-abs(devices[i]["temperature"] - SAFE_MIDPOINT), i, devices[i]["version"])
+                          for i in self.members]
+            heapq.heapify(self.worst)
+
+
+class FleetSummary:
+    """
+    Every reading, alert and SMS updates the counters of the device's
+    facility and region by delta, so serving the overview costs the same
+    with ten devices or ten thousand.
+    """
+
+    def __init__(self, locate, clock, offline_after=120, sms_cost=0.02):
+        self.locate = locate              # f(device_data) -> (facility, region)
+        self.clock = clock
+        self.offline_after = offline_after
+        self.sms_cost = sms_cost
+        self.lock = threading.Lock()
+
+        self.devices = {}                 # deviceId -> device state
+        self.facilities = {}              # facility -> GroupStats
+        self.regions = {}                 # region -> GroupStats
+        self.fleet = GroupStats()
+        self.deadlines = []               # (offline at, deviceId, version)
+        self.day = self._today()
+
+        # version restarts at 0 with the process; the boot id keeps an ETag
+        # from before a restart from matching different content
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._cache_version = -1
+        self._cache_body = None
+
+    # ------------------------------------------------------------------
+    # Updates
+
+    def _groups(self, device):
+        groups = [self.fleet]
+        for index, key in ((self.facilities, device["facility"]), (self.regions, device["region"])):
+            if key is not None:
+                if key not in index:
+                    index[key] = GroupStats()
+                groups.append(index[key])
+        return groups
+
+    def _today(self):
+        return datetime.fromtimestamp(self.clock.time()).date().isoformat()
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            for group in [self.fleet, *self.facilities.values(), *self.regions.values()]:
+                group.sms_today = 0
+            for device in self.devices.values():
+                device["smsToday"] = 0
+            self.version += 1
+
+    def observe(self, device_data):
+        """Fold one reading into the aggregates"""
+        with self.lock:
+            device_id = device_data["deviceId"]
+            device = self.devices.get(device_id)
+            if device is None:
+                facility, region = self.locate(device_data)
+                device = {"deviceId": device_id, "facility": facility, "region": region,
+                          "status": None, "temperature": None, "version": 0,
+                          "openAlert": False, "smsToday": 0}
+                self.devices[device_id] = device
+                for group in self._groups(device):
+                    group.devices += 1
+                    group.members.add(device_id)
+
+            temperature = device_data["temperature"]
+            status = EXCURSION if not TEMP_MIN <= temperature <= TEMP_MAX else IN_RANGE
+            self._set_status(device, status)
+            device["temperature"] = temperature
+            device["version"] += 1
+            for group in self._groups(device):
+                group.push_worst(device, self.devices)
+
+            heapq.heappush(self.deadlines, (self.clock.time() + self.offline_after,
+                                            device_id, device["version"]))
+            # Deadlines only drain when someone reads the summary; drop the
+            # superseded ones if nobody has for a while
+            if len(self.deadlines) > 4 * max(len(self.devices), 16):
+                self.deadlines = [entry for entry in self.deadlines
+                                  if self.devices[entry[1]]["version"] == entry[2]]
+                heapq.heapify(self.deadlines)
+            self.version += 1
+
+    def _set_status(self, device, status):
+        if device["status"] == status:
+            return
+        for group in self._groups(device):
+            if device["status"] is not None:
+                group.status_counts[device["status"]] -= 1
+            group.status_counts[status] += 1
+        device["status"] = status
+
+    def set_alert(self, device_id, is_open):
+        """Track whether a device has an open (already notified) alert"""
+        with self.lock:
+            device = self.devices.get(device_id)
+            if device is None or device["openAlert"] == is_open:
+                return
+            device["openAlert"] = is_open
+            for group in self._groups(device):
+                group.open_alerts += 1 if is_open else -1
+            self.version += 1
+
+    def record_sms(self, device_id, at=None):
+        """Count an SMS sent for a device (ignored if it was sent on another day)"""
+        with self.lock:
+            self._roll_day()
+            if at is not None and datetime.fromtimestamp(at).date().isoformat() != self.day:
+                return
+            device = self.devices.get(device_id)
+            groups = self._groups(device) if device else [self.fleet]
+            for group in groups:
+                group.sms_today += 1
+            if device:
+                device["smsToday"] += 1
+            self.version += 1
+
+    def tick(self):
+        """Mark devices that stopped reporting as offline, and roll the day over"""
+        with self.lock:
+            self._roll_day()
+            now = self.clock.time()
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, device_id, version = heapq.heappop(self.deadlines)
+                device = self.devices.get(device_id)
+                if device and device["version"] == version:
+                    self._set_status(device, OFFLINE)
+                    self.version += 1
+
+    # ------------------------------------------------------------------
+    # Day state for receiver snapshots
+
+    def day_state(self):
+        with self.lock:
+            return {"day": self.day,
+                    "sms": [[d["deviceId"], d["smsToday"]] for d in self.devices.values()
+                            if d["smsToday"]],
+                    "unassigned": self.fleet.sms_today - sum(d["smsToday"] for d in self.devices.values())}
+
+    def load_day_state(self, state):
+        if not state or state["day"] != self._today():
+            return
+        for device_id, count in state["sms"]:
+            for _ in range(count):
+                self.record_sms(device_id)
+        for _ in range(state.get("unassigned", 0)):
+            self.record_sms(None)
+
+    # ------------------------------------------------------------------
+    # Serving
+
+    def etag(self):
+        return f'"{self.boot_id}-{self.day}-{self.version}"'
+
+    def render(self):
+        """JSON body for the current version, rebuilt only when something changed"""
+        self.tick()
+        with self.lock:
+            if self._cache_version != self.version:
+                body = {
+                    "generatedAt": datetime.fromtimestamp(self.clock.time()).isoformat(),
+                    "day": self.day,
+                    "fleet": self.fleet.to_dict(self.devices, self.sms_cost),
+                    "facilities": {name: group.to_dict(self.devices, self.sms_cost)
+                                   for name, group in sorted(self.facilities.items())},
+                    "regions": {name: group.to_dict(self.devices, self.sms_cost)
+                                for name, group in sorted(self.regions.items())},
+                }
+                self._cache_body = json.dumps(body).encode("utf-8")
+                self._cache_version = self.version
+            return self._cache_body, self.etag()
+
+
+def etag_matches(header, etag):
+    """If-None-Match check: a list of tags, weak (W/) ones compared by value"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+class SummaryRequestHandler(BaseHTTPRequestHandler):
+    summary = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/api/summary":
+            self.send_error(404)
+            return
+        body, etag = self.summary.render()
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        # Browsers must revalidate, which is a cheap 304 while nothing changes
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_summary_server(summary, host="localhost", port=8766):
+    """Serve GET /api/summary on a background thread"""
+    handler = type("Handler", (SummaryRequestHandler,), {"summary": summary})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
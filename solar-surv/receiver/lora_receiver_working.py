@@ -1,80 +1,284 @@
 #!/usr/bin/env python3
 import json
+import os
 import time
 import threading
 from datetime import datetime
 import asyncio
 import websockets
+from subscriptions import SubscriptionIndex
+from state_store import StateStore
+from uplink import Uplink
+from ts_codec import ReadingArchive
+from fleet_summary import FleetSummary, start_summary_server
+
+# Which facility/region each device belongs to, used for topic routing
+DEVICE_DIRECTORY = {
+    1: {"facility": "Rural Clinic", "region": "Kisumu"},
+}
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "receiver_state")
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+UPLINK_SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uplink_spool")
+# Central cold-chain server, e.g. http://localhost:8780/ingest for uplink_server.py
+UPLINK_ENDPOINT = os.environ.get("SOLAR_SURV_UPLINK_ENDPOINT")
+
+ALERT_SMS = {
+    1: "🚨 VACCINE ALERT: Device {deviceId} temperature {temperature:.1f}°C is TOO HOT! Safe range: 2-8°C",
+    2: "🚨 VACCINE ALERT: Device {deviceId} temperature {temperature:.1f}°C is TOO COLD! Safe range: 2-8°C",
+    3: "🚨 EMERGENCY ALERT: Device {deviceId} manual emergency button pressed!",
+    4: "⚠️ BATTERY LOW: Device {deviceId} at {batteryVoltage:.1f}V - Device may shut down soon",
+}
 
 class LoRaReceiver:
-    def __init__(self):
+    def __init__(self, device_directory=None, host="localhost", port=8765, state_dir=None,
+                 clock=None, uplink=None, archive=None, summary_port=8766):
+        # Anything with time() and sleep() works as a clock, e.g. the
+        # SimClock in sms_system/sim_clock.py for simulated-time runs
+        self.clock = clock or time
         self.devices = {}
+        self.alert_sent = {}  # deviceId -> alertType already sent by SMS
+        self.sms_count = 0
+        self.sms_cost = 0.02  # $0.02 per SMS
         self.running = True
         self.connected_clients = set()
+        self.subscriptions = SubscriptionIndex(
+            DEVICE_DIRECTORY if device_directory is None else device_directory)
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.uplink = uplink
+        self.archive = archive
+        self.summary = FleetSummary(self.subscriptions.location_of, self.clock,
+                                    sms_cost=self.sms_cost)
+        self.summary_port = summary_port
+        self.state_store = StateStore(state_dir) if state_dir else None
+        if self.state_store:
+            self.restore_state()
         
     async def handle_client(self, websocket, path):
+        """
+        Clients receive every device until they send a subscription, e.g.
+        {"action": "subscribe", "devices": [1], "facilities": [...],
+         "regions": [...], "alertsOnly": true}
+        """
         print(f"Dashboard connected: {websocket.remote_address}")
         self.connected_clients.add(websocket)
+        self.subscriptions.add_client(websocket)
         try:
-            while True:
-                if self.devices:
-                    for device_id, device_data in self.devices.items():
-                        await websocket.send(json.dumps(device_data))
-                await asyncio.sleep(1)
+            await self.send_snapshot(websocket)
+            async for message in websocket:
+                await self.handle_client_message(websocket, message)
         except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
             print("Dashboard disconnected")
             self.connected_clients.discard(websocket)
+            self.subscriptions.remove_client(websocket)
+    
+    async def handle_client_message(self, websocket, message):
+        try:
+            request = json.loads(message)
+            action = request["action"]
+        except (ValueError, KeyError, TypeError):
+            await websocket.send(json.dumps({"type": "error", "error": "invalid request"}))
+            return
+        
+        topics = {
+            "devices": request.get("devices", []),
+            "facilities": request.get("facilities", []),
+            "regions": request.get("regions", []),
+            "alerts_only": request.get("alertsOnly"),
+        }
+        try:
+            if action == "subscribe":
+                self.subscriptions.subscribe(websocket, **topics)
+            elif action == "unsubscribe":
+                self.subscriptions.unsubscribe(websocket, **topics)
+            else:
+                await websocket.send(json.dumps({"type": "error", "error": f"unknown action {action}"}))
+                return
+        except ValueError as e:
+            await websocket.send(json.dumps({"type": "error", "error": str(e)}))
+            return
+        
+        await websocket.send(json.dumps({
+            "type": action + "d",
+            "topics": sorted(f"{kind}:{key}" for kind, key in self.subscriptions.topics.get(websocket, ())),
+            "alertsOnly": websocket in self.subscriptions.alert_only,
+        }))
+        await self.send_snapshot(websocket)
+    
+    async def send_snapshot(self, websocket):
+        """Send the latest reading of every device this client is interested in"""
+        for device_data in list(self.devices.values()):
+            if self.subscriptions.wants(websocket, device_data):
+                await websocket.send(json.dumps(device_data))
+    
+    async def broadcast(self, device_data):
+        """Send one update to exactly the clients subscribed to it"""
+        clients = self.subscriptions.subscribers_for(device_data)
+        if not clients:
+            return
+        message = json.dumps(device_data)
+        results = await asyncio.gather(*(client.send(message) for client in clients),
+                                       return_exceptions=True)
+        for client, result in zip(clients, results):
+            if isinstance(result, Exception):
+                self.connected_clients.discard(client)
+                self.subscriptions.remove_client(client)
     
     async def start_websocket_server(self):
-        server = await websockets.serve(self.handle_client, "localhost", 8765)
-        print("WebSocket server started on ws://localhost:8765")
+        self.loop = asyncio.get_running_loop()
+        server = await websockets.serve(self.handle_client, self.host, self.port)
+        print(f"WebSocket server started on ws://{self.host}:{self.port}")
         await server.wait_closed()
     
+    def process_message(self, device_data):
+        """Store a device reading, alert by SMS and push it to subscribed dashboards"""
+        device_id = device_data["deviceId"]
+        self.record("reading", device=device_data)
+        timestamp = datetime.fromtimestamp(device_data["timestamp"] / 1000).strftime("%H:%M:%S")
+        print(f"[{timestamp}] Device {device_id}: {device_data['temperature']:.1f}°C, "
+              f"Battery: {device_data['batteryVoltage']:.1f}V, "
+              f"Alert: {'Yes' if device_data['alertActive'] else 'No'}")
+        
+        if device_data["alertActive"]:
+            self.handle_alert(device_data)
+        elif device_id in self.alert_sent:
+            self.record("alert_cleared", durable=True, deviceId=device_id)
+        
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self.broadcast(device_data), self.loop)
+        
+        if self.uplink:
+            self.uplink.enqueue("reading", device_data)
+        
+        if self.archive:
+            self.archive.append(device_data)
+        
+        if self.state_store and self.state_store.needs_snapshot():
+            self.state_store.snapshot(self.state_dict())
+    
+    def handle_alert(self, device_data):
+        """Send one SMS per alert episode, not one per reading"""
+        device_id = device_data["deviceId"]
+        alert_type = device_data["alertType"]
+        if self.alert_sent.get(device_id) == alert_type:
+            return
+        
+        # Log before sending: after a reboot we would rather miss a resend
+        # than flood the clinic phone with duplicates
+        self.record("alert_sent", durable=True, deviceId=device_id, alertType=alert_type)
+        message = ALERT_SMS.get(alert_type, "Unknown alert from device {deviceId}").format(**device_data)
+        self.record("sms_sent", durable=True, deviceId=device_id, at=self.clock.time())
+        if self.uplink:
+            self.uplink.enqueue("alert", {"deviceId": device_id, "alertType": alert_type,
+                                          "timestamp": device_data["timestamp"], "message": message})
+        print(f"📱 SMS SENT: {message}")
+        print(f"   SMS Count: {self.sms_count} | Total Cost: ${self.sms_count * self.sms_cost:.2f}")
+    
+    # ------------------------------------------------------------------
+    # Crash-safe state
+    
+    def record(self, op, durable=False, **fields):
+        """Write a mutation to the WAL (if enabled), then apply it"""
+        if self.state_store:
+            entry = self.state_store.append(op, durable=durable, **fields)
+        else:
+            entry = {"op": op, **fields}
+        self.apply(entry)
+    
+    def apply(self, entry):
+        op = entry["op"]
+        if op == "reading":
+            device = entry["device"]
+            self.devices[device["deviceId"]] = device
+            self.summary.observe(device)
+        elif op == "alert_sent":
+            self.alert_sent[entry["deviceId"]] = entry["alertType"]
+            self.summary.set_alert(entry["deviceId"], True)
+        elif op == "alert_cleared":
+            self.alert_sent.pop(entry["deviceId"], None)
+            self.summary.set_alert(entry["deviceId"], False)
+        elif op == "sms_sent":
+            self.sms_count += 1
+            self.summary.record_sms(entry["deviceId"], entry.get("at"))
+    
+    def state_dict(self):
+        return {
+            "devices": list(self.devices.values()),
+            "alert_sent": [[device_id, alert_type] for device_id, alert_type in self.alert_sent.items()],
+            "sms_count": self.sms_count,
+            "sms_today": self.summary.day_state(),
+        }
+    
+    def restore_state(self):
+        """Load the latest snapshot and replay the WAL tail"""
+        started = time.perf_counter()
+        state, tail = self.state_store.recover()
+        if state:
+            self.devices = {device["deviceId"]: device for device in state["devices"]}
+            self.alert_sent = {device_id: alert_type for device_id, alert_type in state["alert_sent"]}
+            self.sms_count = state["sms_count"]
+            for device in self.devices.values():
+                self.summary.observe(device)
+            for device_id in self.alert_sent:
+                self.summary.set_alert(device_id, True)
+            self.summary.load_day_state(state.get("sms_today"))
+        for entry in tail:
+            self.apply(entry)
+        if state or tail:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"Restored {len(self.devices)} devices, {len(self.alert_sent)} open alerts, "
+                  f"{self.sms_count} SMS ({len(tail)} WAL entries) in {elapsed_ms:.0f} ms")
+    
     def simulate_lora_reception(self):
         print("Starting LoRa receiver simulation...")
         while self.running:
-            current_time = int(time.time() * 1000)
-            if int(time.time()) % 30 < 10:
-                device_data = {
-                    "deviceId": 1,
-                    "timestamp": current_time,
-                    "temperature": 4.2,
-                    "batteryVoltage": 3.8,
-                    "emergencyPressed": False,
-                    "alertActive": False,
-                    "alertType": 0
-                }
-            elif int(time.time()) % 30 < 20:
-                device_data = {
-                    "deviceId": 1,
-                    "timestamp": current_time,
-                    "temperature": 9.1,
-                    "batteryVoltage": 3.7,
-                    "emergencyPressed": False,
-                    "alertActive": True,
-                    "alertType": 1
-                }
-            else:
-                device_data = {
-                    "deviceId": 1,
-                    "timestamp": current_time,
-                    "temperature": 1.5,
-                    "batteryVoltage": 3.6,
-                    "emergencyPressed": False,
-                    "alertActive": True,
-                    "alertType": 2
-                }
-            
-            self.devices[1] = device_data
-            timestamp = datetime.fromtimestamp(device_data["timestamp"] / 1000).strftime("%H:%M:%S")
-            print(f"[{timestamp}] Device 1: {device_data['temperature']:.1f}°C, "
-                  f"Battery: {device_data['batteryVoltage']:.1f}V, "
-                  f"Alert: {'Yes' if device_data['alertActive'] else 'No'}")
-            time.sleep(5)
+            self.reception_step()
+            self.clock.sleep(5)
+    
+    def reception_step(self):
+        """Simulate receiving one LoRa packet from device 1"""
+        now = self.clock.time()
+        current_time = int(now * 1000)
+        if int(now) % 30 < 10:
+            device_data = {
+                "deviceId": 1,
+                "timestamp": current_time,
+                "temperature": 4.2,
+                "batteryVoltage": 3.8,
+                "emergencyPressed": False,
+                "alertActive": False,
+                "alertType": 0
+            }
+        elif int(now) % 30 < 20:
+            device_data = {
+                "deviceId": 1,
+                "timestamp": current_time,
+                "temperature": 9.1,
+                "batteryVoltage": 3.7,
+                "emergencyPressed": False,
+                "alertActive": True,
+                "alertType": 1
+            }
+        else:
+            device_data = {
+                "deviceId": 1,
+                "timestamp": current_time,
+                "temperature": 1.5,
+                "batteryVoltage": 3.6,
+                "emergencyPressed": False,
+                "alertActive": True,
+                "alertType": 2
+            }
+        
+        self.process_message(device_data)
     
     def start(self):
         print("=== Solar-Surv LoRa Receiver ===")
-        print("WebSocket server: ws://localhost:8765")
+        print(f"WebSocket server: ws://{self.host}:{self.port}")
         print()
         
         def run_websocket():
@@ -83,12 +287,34 @@ class LoRaReceiver:
         ws_thread = threading.Thread(target=run_websocket, daemon=True)
         ws_thread.start()
         
+        start_summary_server(self.summary, self.host, self.summary_port)
+        print(f"Fleet summary: http://{self.host}:{self.summary_port}/api/summary")
+        
+        if self.uplink:
+            print(f"Uplink: {self.uplink.endpoint} ({self.uplink.pending()} records pending)")
+            self.uplink.start()
+        
+        if self.archive:
+            # Recompress older history in the background
+            compaction_thread = threading.Thread(target=self.archive.run_compaction,
+                                                 args=(self.clock,), daemon=True)
+            compaction_thread.start()
+        
         try:
             self.simulate_lora_reception()
         except KeyboardInterrupt:
             print("Shutting down...")
             self.running = False
+            if self.state_store:
+                self.state_store.snapshot(self.state_dict())
+                self.state_store.close()
+            if self.uplink:
+                self.uplink.stop()
+            if self.archive:
+                self.archive.close()
 
 if __name__ == "__main__":
-    receiver = LoRaReceiver()
+    uplink = Uplink(UPLINK_ENDPOINT, UPLINK_SPOOL_DIR) if UPLINK_ENDPOINT else None
+    receiver = LoRaReceiver(state_dir=STATE_DIR, uplink=uplink,
+                            archive=ReadingArchive(HISTORY_DIR))
     receiver.start()
\ No newline at end of file
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Receiver Soak Test
+Runs the LoRa receiver for a long simulated period with many devices and
+churning dashboard clients, sampling memory, object counts, queue depths
+and p99 latency. Exits non-zero if any of them trend upwards.
+
+    python soak_receiver.py --hours 48 --devices 200 --clients 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import websockets.exceptions
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "sms_system"))
+from sim_clock import SimClock
+from sms_receiver import SMSReceiver
+
+from lora_receiver_working import LoRaReceiver
+from ts_codec import ReadingArchive
+from uplink import Uplink
+from uplink_server import start_server
+
+_CLOSED = object()
+
+
+class SoakClient:
+    """
+    Stand-in for a dashboard WebSocket. It subscribes to a random topic and
+    later goes away cleanly, with a dropped connection, or with an
+    unexpected error.
+    """
+
+    def __init__(self, client_id, rng):
+        self.remote_address = ("soak", client_id)
+        self.requests = asyncio.Queue()
+        self.error = None
+        self.closed = False
+        self.received = 0
+        self.rng = rng
+
+    async def send(self, message):
+        if self.closed:
+            raise self.error or websockets.exceptions.ConnectionClosedOK(None, None)
+        self.received += 1
+
+    def subscribe(self, request):
+        self.requests.put_nowait(request)
+
+    def disconnect(self):
+        self.closed = True
+        self.error = self.rng.choice([
+            None,                                                  # clean close
+            websockets.exceptions.ConnectionClosedError(None, None),  # dropped link
+            ConnectionResetError("connection reset by peer"),
+            RuntimeError("unexpected client failure"),
+        ])
+        self.requests.put_nowait(_CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        request = await self.requests.get()
+        if request is _CLOSED:
+            if self.error is not None:
+                raise self.error
+            raise StopAsyncIteration
+        return request
+
+
+def slope(xs, ys):
+    """Least-squares slope of ys over xs"""
+    n = len(xs)
+    if n < 2:
+        return 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class SoakTest:
+    def __init__(self, hours=24, devices=100, clients=30, interval=30, seed=1,
+                 sample_every=3600, workdir=None):
+        self.hours = hours
+        self.num_devices = devices
+        self.num_clients = clients
+        self.interval = interval          # simulated seconds between readings
+        self.sample_every = sample_every  # simulated seconds between samples
+        self.rng = random.Random(seed)
+        self.workdir = workdir or tempfile.mkdtemp(prefix="solar-surv-soak-")
+        self.clock = SimClock()
+
+        self.facilities = [f"Facility {i}" for i in range(max(1, devices // 10))]
+        self.regions = [f"Region {i}" for i in range(max(1, devices // 50))]
+        directory = {}
+        for device_id in range(1, devices + 1):
+            facility = self.rng.randrange(len(self.facilities))
+            directory[device_id] = {"facility": self.facilities[facility],
+                                    "region": self.regions[facility % len(self.regions)]}
+
+        self.server, self.ingest = start_server(port=0, keep_records=False)
+        endpoint = f"http://localhost:{self.server.server_port}/ingest"
+        self.receiver = LoRaReceiver(
+            device_directory=directory, clock=self.clock,
+            state_dir=os.path.join(self.workdir, "state"),
+            uplink=Uplink(endpoint, os.path.join(self.workdir, "uplink"), flush_interval=1),
+            archive=ReadingArchive(os.path.join(self.workdir, "history")))
+        # Default phone inbox, so a change to its retention shows up here
+        self.phone = SMSReceiver("+1234567890", clock=self.clock)
+
+        self.clients = {}       # client -> handler task
+        self.next_client_id = 1
+        self.latencies = []
+        self.samples = []
+        self.temperatures = {d: 5.0 for d in directory}
+
+    # ------------------------------------------------------------------
+    # Load
+
+    def connect_client(self):
+        client = SoakClient(self.next_client_id, self.rng)
+        self.next_client_id += 1
+        kind = self.rng.choice(["all", "device", "facility", "region", "alerts"])
+        if kind == "device":
+            client.subscribe(f'{{"action": "subscribe", "devices": [{self.rng.randint(1, self.num_devices)}]}}')
+        elif kind == "facility":
+            client.subscribe(f'{{"action": "subscribe", "facilities": ["{self.rng.choice(self.facilities)}"]}}')
+        elif kind == "region":
+            client.subscribe(f'{{"action": "subscribe", "regions": ["{self.rng.choice(self.regions)}"]}}')
+        elif kind == "alerts":
+            client.subscribe('{"action": "subscribe", "alertsOnly": true}')
+        self.clients[client] = asyncio.ensure_future(self.receiver.handle_client(client, "/"))
+
+    async def churn_clients(self):
+        """Drop about a fifth of the clients and connect replacements"""
+        for client in list(self.clients):
+            if self.rng.random() < 0.2:
+                client.disconnect()
+        await asyncio.sleep(0)
+        for client, task in list(self.clients.items()):
+            if task.done():
+                if not task.cancelled():
+                    task.exception()  # errors are expected here, mark them retrieved
+                del self.clients[client]
+        while len(self.clients) < self.num_clients:
+            self.connect_client()
+
+    def reading(self, device_id):
+        temperature = self.temperatures[device_id] + self.rng.uniform(-0.3, 0.3)
+        temperature = min(12.0, max(-1.0, temperature))
+        self.temperatures[device_id] = temperature
+        alert_type = 1 if temperature > 8.0 else 2 if temperature < 2.0 else 0
+        return {
+            "deviceId": device_id,
+            "timestamp": int(self.clock.time() * 1000),
+            "temperature": round(temperature, 1),
+            "batteryVoltage": 3.8,
+            "emergencyPressed": False,
+            "alertActive": alert_type != 0,
+            "alertType": alert_type,
+        }
+
+    async def ingest_round(self):
+        for device_id in range(1, self.num_devices + 1):
+            data = self.reading(device_id)
+            sms_before = self.receiver.sms_count
+            started = time.perf_counter()
+            self.receiver.process_message(data)
+            await self.receiver.broadcast(data)
+            self.latencies.append(time.perf_counter() - started)
+            if self.receiver.sms_count > sms_before:
+                self.phone.receive_sms(f"Alert from device {device_id}", device_id=device_id)
+
+    # ------------------------------------------------------------------
+    # Measurements
+
+    def sample(self):
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        self.receiver.archive.compact(int(self.clock.time() * 1000))
+        self.samples.append({
+            "hour": (self.clock.time() - self.started_at) / 3600,
+            "memory": current,
+            "objects": len(gc.get_objects()),
+            "clients": len(self.receiver.connected_clients),
+            "subscribers": len(self.receiver.subscriptions.topics),
+            "tasks": len(asyncio.all_tasks()),
+            "wal": self.receiver.state_store.wal_entries,
+            "uplink_pending": self.receiver.uplink.pending(),
+            "inbox": self.phone.store.count(),
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+        })
+        self.latencies = []
+
+    async def run(self):
+        # The receiver is driven directly, not through its own event loop
+        self.receiver.loop = None
+        tracemalloc.start()
+        self.started_at = self.clock.time()
+        end = self.started_at + self.hours * 3600
+        next_sample = self.started_at + self.sample_every
+        # The real sender thread drains the spool while readings pour in
+        sender = self.receiver.uplink.start()
+        with open(os.devnull, "w", encoding="utf-8") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            await self.churn_clients()
+            while self.clock.time() < end:
+                await self.ingest_round()
+                await self.churn_clients()
+                self.clock.sleep(self.interval)
+                if self.clock.time() >= next_sample:
+                    self.sample()
+                    next_sample += self.sample_every
+            for client in list(self.clients):
+                client.disconnect()
+            await asyncio.gather(*self.clients.values(), return_exceptions=True)
+            self.clients.clear()
+        self.receiver.uplink.stop()
+        sender.join(5)
+        tracemalloc.stop()
+        self.server.shutdown()
+
+    # ------------------------------------------------------------------
+    # Verdict
+
+    def check(self, max_growth_mb_per_month=10.0, max_p99_ratio=3.0):
+        """Return a list of failure messages (empty when the run is healthy)"""
+        failures = []
+        # Ignore the first quarter: caches and indexes are still warming up
+        steady = self.samples[len(self.samples) // 4:]
+        if len(steady) < 4:
+            return ["not enough samples, run for longer"]
+        hours = [s["hour"] for s in steady]
+
+        quarter = max(1, len(steady) // 4)
+
+        def grew(key, projected_limit):
+            # A leak shows both as a steep trend and as a real step up between
+            # the start and end of the run; either alone is usually noise
+            projected = slope(hours, [s[key] for s in steady]) * 24 * 30
+            early = sorted(s[key] for s in steady[:quarter])[quarter // 2]
+            late = sorted(s[key] for s in steady[-quarter:])[quarter // 2]
+            return projected > projected_limit and late > early * 1.1, projected
+
+        leaking, growth = grew("memory", max_growth_mb_per_month * 1e6)
+        if leaking:
+            failures.append(f"memory grows {growth / 1e6:.1f} MB/month")
+        leaking, objects = grew("objects", steady[0]["objects"] * 0.1)
+        if leaking:
+            failures.append(f"object count grows {objects:.0f}/month")
+        leaking, inbox = grew("inbox", max(10, steady[0]["inbox"] * 0.1))
+        if leaking:
+            failures.append(f"phone inbox grows {inbox:.0f} messages/month")
+        leaking, backlog = grew("uplink_pending", self.receiver.uplink.batch_size)
+        if leaking:
+            failures.append(f"uplink backlog grows {backlog:.0f} records/month")
+        limits = {
+            "subscribers": self.num_clients * 2,
+            "tasks": self.num_clients * 2 + 5,
+            "wal": self.receiver.state_store.snapshot_every,
+            # The sender wakes at batch_size, so the backlog sits around it
+            "uplink_pending": self.receiver.uplink.batch_size * 4,
+        }
+        for key, limit in limits.items():
+            if max(s[key] for s in steady) > limit:
+                failures.append(f"{key} exceeded {limit}: {steady[0][key]} -> {steady[-1][key]}")
+        if self.receiver.connected_clients or self.receiver.subscriptions.topics:
+            failures.append(f"{len(self.receiver.connected_clients)} sockets leaked after all clients left")
+
+        early = sorted(s["p99_ms"] for s in steady[:quarter])[quarter // 2]
+        late = sorted(s["p99_ms"] for s in steady[-quarter:])[quarter // 2]
+        if early > 0 and late / early > max_p99_ratio:
+            failures.append(f"p99 latency rose from {early:.2f} ms to {late:.2f} ms")
+        return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solar-Surv receiver soak test")
+    parser.add_argument("--hours", type=float, default=24, help="simulated hours to run")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=30, help="dashboard clients kept connected")
+    parser.add_argument("--interval", type=int, default=30, help="simulated seconds between readings")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print("🔥 Solar-Surv Receiver Soak Test")
+    print(f"{args.hours:g} simulated hours, {args.devices} devices, {args.clients} clients")
+    print("=" * 60)
+    soak = SoakTest(args.hours, args.devices, args.clients, args.interval, args.seed)
+    started = time.time()
+    asyncio.run(soak.run())
+
+    print(f"{'hour':>6} {'memory':>10} {'objects':>9} {'clients':>8} {'tasks':>6} "
+          f"{'wal':>6} {'uplink':>7} {'inbox':>6} {'p99 ms':>8}")
+    for s in soak.samples:
+        print(f"{s['hour']:6.1f} {s['memory'] / 1e6:9.2f}M {s['objects']:9d} {s['clients']:8d} "
+              f"{s['tasks']:6d} {s['wal']:6d} {s['uplink_pending']:7d} {s['inbox']:6d} "
+              f"{s['p99_ms']:8.3f}")
+    print(f"Finished in {time.time() - started:.0f}s real time")
+
+    failures = soak.check()
+    if failures:
+        print("\n❌ SOAK TEST FAILED")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ No resource growth detected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Receiver State Store
+Write-ahead log plus periodic snapshots so the receiver survives brown-outs
+"""
+
+import json
+import os
+import threading
+
+SNAPSHOT_FILE = "state.snapshot.json"
+WAL_FILE = "state.wal"
+
+
+class StateStore:
+    """
+    Every state mutation is appended to the WAL before it is applied.
+    After `snapshot_every` entries the caller's full state is written to a
+    snapshot (tmp file + rename) and the WAL is started again, so a restart
+    loads one snapshot and replays only the short WAL tail.
+    """
+
+    def __init__(self, directory, snapshot_every=1000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.wal_path = os.path.join(directory, WAL_FILE)
+        self.seq = 0
+        self.wal_entries = 0
+        self.lock = threading.Lock()
+        self._wal = None
+        os.makedirs(directory, exist_ok=True)
+
+    def recover(self):
+        """
+        Return (state, tail) where state is the last snapshot (or None) and
+        tail is the list of WAL entries written after it, in order.
+        """
+        state = None
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            state = snapshot["state"]
+            snapshot_seq = snapshot["seq"]
+
+        tail = []
+        valid_bytes = 0
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write from a power cut
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_bytes += len(line)
+                    if entry["seq"] > snapshot_seq:
+                        tail.append(entry)
+            # Drop a torn tail so new entries start on a clean line
+            if os.path.getsize(self.wal_path) > valid_bytes:
+                with open(self.wal_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+
+        self.seq = tail[-1]["seq"] if tail else snapshot_seq
+        self.wal_entries = len(tail)
+        return state, tail
+
+    def append(self, op, durable=False, **fields):
+        """
+        Log one mutation. durable=True fsyncs before returning; use it for
+        anything that must not be repeated after a reboot (alerts, SMS).
+        """
+        with self.lock:
+            if self._wal is None:
+                self._wal = open(self.wal_path, "a", encoding="utf-8")
+            self.seq += 1
+            entry = {"seq": self.seq, "op": op, **fields}
+            self._wal.write(json.dumps(entry) + "\n")
+            self._wal.flush()
+            if durable:
+                os.fsync(self._wal.fileno())
+            self.wal_entries += 1
+            return entry
+
+    def needs_snapshot(self):
+        return self.wal_entries >= self.snapshot_every
+
+    def snapshot(self, state):
+        """Write a full snapshot of state and reset the WAL"""
+        with self.lock:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"seq": self.seq, "state": state}, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            # Entries up to self.seq are covered by the snapshot now
+            if self._wal is not None:
+                self._wal.close()
+            self._wal = open(self.wal_path, "w", encoding="utf-8")
+            os.fsync(self._wal.fileno())
+            self.wal_entries = 0
+
+    def close(self):
+        with self.lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Dashboard Subscriptions
+Routes device updates only to the WebSocket clients that asked for them
+"""
+
+SCALARS = (str, int, float)
+
+
+def _check_topics(devices, facilities, regions, alerts_only):
+    """Raise ValueError unless every topic field is a list of plain values"""
+    for name, keys in (('devices', devices), ('facilities', facilities),
+                       ('regions', regions)):
+        if not isinstance(keys, (list, tuple, set)):
+            raise ValueError(f"{name} must be a list")
+        for key in keys:
+            if isinstance(key, bool) or not isinstance(key, SCALARS):
+                raise ValueError(f"{name} may only contain names or ids, not {key!r}")
+    if alerts_only is not None and not isinstance(alerts_only, bool):
+        raise ValueError("alertsOnly must be true or false")
+
+
+class SubscriptionIndex:
+    """
+    Inverted index from topics to subscribed clients.
+
+    Topics are a device id, a facility, a region, or the alert-only stream.
+    Clients that never subscribe keep receiving everything, which is what the
+    existing dashboard expects.
+    """
+
+    def __init__(self, device_directory=None):
+        # deviceId -> {'facility': ..., 'region': ...}
+        self.device_directory = dict(device_directory or {})
+
+        self.by_device = {}        # deviceId -> set of clients
+        self.by_facility = {}      # facility -> set of clients
+        self.by_region = {}        # region -> set of clients
+        self.alert_only = {}       # client -> True while on the alert stream
+        self.alert_stream = set()  # alert-only clients without topics: get every alert
+        self.everything = set()    # clients without any subscription
+        self.topics = {}           # client -> set of (kind, key)
+
+    # ------------------------------------------------------------------
+    # Clients
+
+    def add_client(self, client):
+        self.topics[client] = set()
+        self.everything.add(client)
+
+    def remove_client(self, client):
+        for kind, key in self.topics.pop(client, set()):
+            self._index(kind).get(key, set()).discard(client)
+            self._prune(kind, key)
+        self.everything.discard(client)
+        self.alert_only.pop(client, None)
+        self.alert_stream.discard(client)
+
+    def subscribe(self, client, devices=(), facilities=(), regions=(), alerts_only=None):
+        """Add topics for a client; raises ValueError for a malformed request"""
+        _check_topics(devices, facilities, regions, alerts_only)
+        topics = self.topics.setdefault(client, set())
+        for kind, keys in (('device', devices), ('facility', facilities),
+                           ('region', regions)):
+            for key in keys:
+                self._index(kind).setdefault(key, set()).add(client)
+                topics.add((kind, key))
+        if alerts_only is not None:
+            if alerts_only:
+                self.alert_only[client] = True
+            else:
+                self.alert_only.pop(client, None)
+        self._update_everything(client)
+
+    def unsubscribe(self, client, devices=(), facilities=(), regions=(), alerts_only=None):
+        """Drop topics for a client; raises ValueError for a malformed request"""
+        _check_topics(devices, facilities, regions, alerts_only)
+        topics = self.topics.get(client, set())
+        for kind, keys in (('device', devices), ('facility', facilities),
+                           ('region', regions)):
+            for key in keys:
+                self._index(kind).get(key, set()).discard(client)
+                self._prune(kind, key)
+                topics.discard((kind, key))
+        if alerts_only:
+            self.alert_only.pop(client, None)
+        self._update_everything(client)
+
+    def _update_everything(self, client):
+        if self.topics.get(client) or client in self.alert_only:
+            self.everything.discard(client)
+        else:
+            self.everything.add(client)
+        if client in self.alert_only and not self.topics.get(client):
+            self.alert_stream.add(client)
+        else:
+            self.alert_stream.discard(client)
+
+    def _index(self, kind):
+        return {'device': self.by_device, 'facility': self.by_facility,
+                'region': self.by_region}[kind]
+
+    def _prune(self, kind, key):
+        index = self._index(kind)
+        if key in index and not index[key]:
+            del index[key]
+
+    # ------------------------------------------------------------------
+    # Routing
+
+    def register_device(self, device_id, facility=None, region=None):
+        self.device_directory[device_id] = {'facility': facility, 'region': region}
+
+    def location_of(self, data):
+        """Facility and region for a message, from the message or the directory"""
+        entry = self.device_directory.get(data['deviceId'], {})
+        return (data.get('facility', entry.get('facility')),
+                data.get('region', entry.get('region')))
+
+    def subscribers_for(self, data):
+        """All clients that should receive this device update"""
+        facility, region = self.location_of(data)
+        interested = set(self.everything)
+        interested |= self.by_device.get(data['deviceId'], set())
+        if facility is not None:
+            interested |= self.by_facility.get(facility, set())
+        if region is not None:
+            interested |= self.by_region.get(region, set())
+
+        if data.get('alertActive'):
+            interested |= self.alert_stream
+        elif self.alert_only:
+            interested = {c for c in interested if c not in self.alert_only}
+        return interested
+
+    def wants(self, client, data):
+        """Whether one client should receive this device update"""
+        if client in self.alert_only and not data.get('alertActive'):
+            return False
+        if client in self.everything:
+            return True
+        topics = self.topics.get(client, set())
+        if not topics:
+            return client in self.alert_only
+        facility, region = self.location_of(data)
+        return (('device', data['deviceId']) in topics
+                or ('facility', facility) in topics
+                or ('region', region) in topics)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: fleet summary checks
+Run with: python -m pytest test_fleet_summary.py
+"""
+
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "sms_system"))
+from sim_clock import SimClock
+
+from fleet_summary import FleetSummary, etag_matches, start_summary_server
+
+DIRECTORY = {1: ("Clinic A", "North"), 2: ("Clinic A", "North"), 3: ("Clinic B", "South")}
+
+
+def make_summary():
+    clock = SimClock(datetime(2024, 1, 1, 22, 0))
+    summary = FleetSummary(lambda data: DIRECTORY[data["deviceId"]], clock, offline_after=120)
+    return summary, clock
+
+
+def body(summary):
+    return json.loads(summary.render()[0])
+
+
+def test_status_counts_follow_readings():
+    summary, _ = make_summary()
+    summary.observe({"deviceId": 1, "temperature": 5.0})
+    summary.observe({"deviceId": 2, "temperature": 9.0})
+    summary.observe({"deviceId": 3, "temperature": 1.0})
+    view = body(summary)
+    assert view["fleet"]["devices"] == 3
+    assert (view["fleet"]["inRange"], view["fleet"]["excursion"]) == (1, 2)
+    assert view["facilities"]["Clinic A"]["excursion"] == 1
+    assert view["regions"]["South"]["excursion"] == 1
+
+    summary.observe({"deviceId": 2, "temperature": 6.0})   # back in range
+    summary.observe({"deviceId": 1, "temperature": 8.5})   # out of range
+    view = body(summary)
+    assert (view["fleet"]["inRange"], view["fleet"]["excursion"]) == (1, 2)
+    assert view["facilities"]["Clinic A"]["inRange"] == 1
+    assert view["facilities"]["Clinic A"]["devices"] == 2
+
+
+def test_silent_devices_go_offline_and_come_back():
+    summary, clock = make_summary()
+    summary.observe({"deviceId": 1, "temperature": 5.0})
+    summary.observe({"deviceId": 3, "temperature": 5.0})
+    clock.sleep(100)
+    summary.observe({"deviceId": 3, "temperature": 5.1})
+    clock.sleep(30)
+    summary.tick()
+    view = body(summary)
+    assert view["fleet"]["offline"] == 1
+    assert view["facilities"]["Clinic A"]["offline"] == 1
+    assert view["facilities"]["Clinic B"]["inRange"] == 1
+
+    summary.observe({"deviceId": 1, "temperature": 5.0})
+    assert body(summary)["fleet"]["offline"] == 0
+
+
+def test_alerts_and_sms_counters_roll_over_at_midnight():
+    summary, clock = make_summary()
+    summary.observe({"deviceId": 1, "temperature": 9.0})
+    summary.observe({"deviceId": 3, "temperature": 9.0})
+    summary.set_alert(1, True)
+    summary.set_alert(1, True)          # repeated: counted once
+    summary.set_alert(3, True)
+    summary.record_sms(1, clock.time())
+    summary.record_sms(3, clock.time())
+    summary.record_sms(3, clock.time() - 86400)   # yesterday's SMS is ignored
+    view = body(summary)
+    assert view["fleet"]["openAlerts"] == 2
+    assert view["fleet"]["smsToday"] == 2
+    assert view["fleet"]["costToday"] == 0.04
+    assert view["facilities"]["Clinic B"]["smsToday"] == 1
+
+    summary.set_alert(3, False)
+    clock.sleep(3 * 3600)               # past midnight
+    view = body(summary)
+    assert view["day"] == "2024-01-02"
+    assert view["fleet"]["openAlerts"] == 1
+    assert view["fleet"]["smsToday"] == 0
+    assert view["facilities"]["Clinic A"]["smsToday"] == 0
+
+
+def test_worst_device_after_many_updates():
+    summary, _ = make_summary()
+    for i in range(500):
+        summary.observe({"deviceId": 1, "temperature": 5.0 + (i % 5) * 0.5})
+        summary.observe({"deviceId": 2, "temperature": 5.0})
+    summary.observe({"deviceId": 3, "temperature": 4.0})
+    view = body(summary)
+    assert view["facilities"]["Clinic A"]["worstDevice"] == 1
+    assert view["facilities"]["Clinic A"]["worstTemperature"] == 7.0
+    assert view["regions"]["South"]["worstDevice"] == 3
+    assert len(summary.facilities["Clinic A"].worst) <= 4 * 16 + 1
+
+    summary.observe({"deviceId": 1, "temperature": 5.0})
+    summary.observe({"deviceId": 2, "temperature": 11.0})
+    assert body(summary)["fleet"]["worstDevice"] == 2
+
+
+def test_etag_matching():
+    assert etag_matches('"abc-1"', '"abc-1"')
+    assert etag_matches('W/"abc-1"', '"abc-1"')
+    assert etag_matches('"old", W/"abc-1"', '"abc-1"')
+    assert etag_matches('*', '"abc-1"')
+    assert not etag_matches('"abc-2"', '"abc-1"')
+    assert not etag_matches(None, '"abc-1"')
+
+
+def test_endpoint_revalidates_with_etag():
+    summary, _ = make_summary()
+    summary.observe({"deviceId": 1, "temperature": 5.0})
+    server = start_summary_server(summary, port=0)
+    url = f"http://localhost:{server.server_port}/api/summary"
+    try:
+        with urllib.request.urlopen(url) as response:
+            assert response.status == 200
+            etag = response.headers["ETag"]
+            assert json.loads(response.read())["fleet"]["devices"] == 1
+
+        for header in (etag, f"W/{etag}", f'"stale", {etag}'):
+            request = urllib.request.Request(url, headers={"If-None-Match": header})
+            with pytest.raises(urllib.error.HTTPError) as e:
+                urllib.request.urlopen(request)
+            assert e.value.code == 304
+
+        summary.observe({"deviceId": 2, "temperature": 5.0})
+        request = urllib.request.Request(url, headers={"If-None-Match": etag})
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 200
+            assert response.headers["ETag"] != etag
+    finally:
+        server.shutdown()
+        server.server_close()
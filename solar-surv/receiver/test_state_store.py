@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: crash recovery checks for the receiver state store
+Run with: python -m pytest test_state_store.py
+"""
+
+import os
+import shutil
+import tempfile
+
+from state_store import StateStore
+from lora_receiver_working import LoRaReceiver
+
+
+def reading(device_id, temperature, alert_type=0, timestamp=1_700_000_000_000):
+    return {"deviceId": device_id, "timestamp": timestamp, "temperature": temperature,
+            "batteryVoltage": 3.8, "emergencyPressed": False,
+            "alertActive": alert_type != 0, "alertType": alert_type}
+
+
+def test_wal_replays_in_order():
+    with tempfile.TemporaryDirectory() as directory:
+        store = StateStore(directory)
+        for i in range(5):
+            store.append("reading", n=i)
+        store.close()
+
+        state, tail = StateStore(directory).recover()
+        assert state is None
+        assert [entry["n"] for entry in tail] == [0, 1, 2, 3, 4]
+        assert [entry["seq"] for entry in tail] == [1, 2, 3, 4, 5]
+
+
+def test_torn_wal_tail_is_dropped():
+    with tempfile.TemporaryDirectory() as directory:
+        store = StateStore(directory)
+        store.append("reading", n=0)
+        store.append("reading", n=1)
+        store.close()
+        with open(os.path.join(directory, "state.wal"), "a", encoding="utf-8") as f:
+            f.write('{"seq": 3, "op": "readi')   # power cut mid-write
+
+        store = StateStore(directory)
+        _, tail = store.recover()
+        assert [entry["n"] for entry in tail] == [0, 1]
+        store.append("reading", n=2)
+        store.close()
+        _, tail = StateStore(directory).recover()
+        assert [(entry["seq"], entry["n"]) for entry in tail] == [(1, 0), (2, 1), (3, 2)]
+
+
+def test_crash_between_snapshot_and_wal_reset():
+    with tempfile.TemporaryDirectory() as directory:
+        wal_path = os.path.join(directory, "state.wal")
+        store = StateStore(directory)
+        for i in range(3):
+            store.append("reading", n=i)
+        shutil.copy(wal_path, wal_path + ".before")
+        store.snapshot({"count": 3})
+        store.close()
+        # The snapshot rename happened but the WAL was never reset
+        os.replace(wal_path + ".before", wal_path)
+        # and a half-written snapshot tmp file was left behind
+        with open(os.path.join(directory, "state.snapshot.json.tmp"), "w") as f:
+            f.write('{"seq": 9')
+
+        store = StateStore(directory)
+        state, tail = store.recover()
+        assert state == {"count": 3}
+        assert tail == []        # entries up to the snapshot seq are skipped
+        store.append("reading", n=3)
+        store.close()
+        state, tail = StateStore(directory).recover()
+        assert [(entry["seq"], entry["n"]) for entry in tail] == [(4, 3)]
+
+
+def test_receiver_does_not_resend_sms_after_crash():
+    with tempfile.TemporaryDirectory() as directory:
+        receiver = LoRaReceiver(state_dir=directory)
+        receiver.process_message(reading(1, 4.5))
+        receiver.process_message(reading(1, 9.5, alert_type=1))
+        assert receiver.sms_count == 1
+        # Power cut: no snapshot, no clean close
+
+        rebooted = LoRaReceiver(state_dir=directory)
+        assert rebooted.sms_count == 1
+        assert rebooted.alert_sent == {1: 1}
+        rebooted.process_message(reading(1, 9.6, alert_type=1))
+        assert rebooted.sms_count == 1            # same episode, no duplicate SMS
+        rebooted.process_message(reading(1, 5.0))
+        rebooted.process_message(reading(1, 9.8, alert_type=1))
+        assert rebooted.sms_count == 2            # a new episode alerts again
+
+
+def test_receiver_restores_from_snapshot_and_tail():
+    with tempfile.TemporaryDirectory() as directory:
+        receiver = LoRaReceiver(state_dir=directory)
+        receiver.process_message(reading(1, 9.5, alert_type=1))
+        receiver.state_store.snapshot(receiver.state_dict())
+        receiver.process_message(reading(2, 1.0, alert_type=2))
+        receiver.state_store.close()
+
+        rebooted = LoRaReceiver(state_dir=directory)
+        assert set(rebooted.devices) == {1, 2}
+        assert rebooted.alert_sent == {1: 1, 2: 2}
+        assert rebooted.sms_count == 2
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: dashboard subscription checks
+Run with: python -m pytest test_subscriptions.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from subscriptions import SubscriptionIndex
+from lora_receiver_working import LoRaReceiver
+
+DIRECTORY = {1: {"facility": "Clinic A", "region": "North"},
+             2: {"facility": "Clinic B", "region": "South"}}
+
+
+def update(device_id, alert=False):
+    return {"deviceId": device_id, "alertActive": alert}
+
+
+def test_routing_by_topic():
+    index = SubscriptionIndex(DIRECTORY)
+    for client in ("all", "device", "region", "alerts"):
+        index.add_client(client)
+    index.subscribe("device", devices=[1])
+    index.subscribe("region", regions=["South"])
+    index.subscribe("alerts", alerts_only=True)
+
+    assert index.subscribers_for(update(1)) == {"all", "device"}
+    assert index.subscribers_for(update(2)) == {"all", "region"}
+    assert index.subscribers_for(update(2, alert=True)) == {"all", "region", "alerts"}
+
+    index.subscribe("alerts", facilities=["Clinic A"])   # alerts for one clinic only
+    assert index.subscribers_for(update(2, alert=True)) == {"all", "region"}
+    index.remove_client("alerts")
+    assert not index.alert_stream and "alerts" not in index.alert_only
+
+
+@pytest.mark.parametrize("fields", [
+    {"devices": 5},
+    {"devices": [[1, 2]]},
+    {"facilities": [{"name": "Clinic A"}]},
+    {"regions": "North"},
+    {"alerts_only": "yes"},
+])
+def test_malformed_subscription_is_rejected(fields):
+    index = SubscriptionIndex(DIRECTORY)
+    index.add_client("c")
+    with pytest.raises(ValueError):
+        index.subscribe("c", **fields)
+    assert index.topics["c"] == set()
+    assert "c" in index.everything
+
+
+class FakeSocket:
+    remote_address = ("test", 1)
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def test_receiver_answers_bad_payload_with_error():
+    receiver = LoRaReceiver(device_directory=DIRECTORY)
+    socket = FakeSocket()
+    receiver.subscriptions.add_client(socket)
+
+    async def exchange():
+        await receiver.handle_client_message(socket, '{"action": "subscribe", "devices": 5}')
+        await receiver.handle_client_message(socket, '{"action": "subscribe", "devices": [1]}')
+
+    asyncio.run(exchange())
+    assert socket.sent[0]["type"] == "error"
+    assert socket.sent[1] == {"type": "subscribed", "topics": ["device:1"], "alertsOnly": False}
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: time-series codec and archive checks
+Run with: python -m pytest test_ts_codec.py
+"""
+
+import os
+import tempfile
+import threading
+
+import ts_codec
+from ts_codec import BlockFile, ReadingArchive, encode_block, decode_block
+
+START_MS = 1_700_000_000_000
+STEP_MS = 5000
+
+
+def reading(i, device_id=1):
+    return {"deviceId": device_id, "timestamp": START_MS + i * STEP_MS,
+            "temperature": round(4.0 + (i % 7) * 0.1, 1), "batteryVoltage": 3.8}
+
+
+def as_lists(result):
+    return [list(map(int, result[0])), [round(float(t), 2) for t in result[1]]]
+
+
+def test_block_round_trip(monkeypatch):
+    timestamps = [START_MS + i * STEP_MS + (3 if i == 5 else 0) for i in range(50)]
+    temps = [4.0 + i * 0.01 for i in range(50)]
+    volts = [3.8 - i * 0.001 for i in range(50)]
+    block = encode_block(timestamps, temps, volts)
+    for numpy in (ts_codec.np, None):
+        monkeypatch.setattr(ts_codec, "np", numpy)
+        decoded = decode_block(block)
+        assert list(map(int, decoded[0])) == timestamps
+        assert [round(float(t), 2) for t in decoded[1]] == [round(t, 2) for t in temps]
+
+
+def make_archive(directory, readings=100):
+    archive = ReadingArchive(directory, block_size=20, hot_seconds=60)
+    for i in range(readings):
+        archive.append(reading(i))
+    return archive
+
+
+def test_compaction_keeps_every_reading():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = make_archive(directory)
+        now = START_MS + 100 * STEP_MS
+        assert archive.compact(now) == 80
+        result = archive.read_range(1, START_MS, now)
+        assert as_lists(result)[0] == [START_MS + i * STEP_MS for i in range(100)]
+        archive.close()
+
+
+def test_crash_mid_compaction_does_not_duplicate():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = make_archive(directory)
+        hot_path = archive._hot_path(1)
+        with open(hot_path, encoding="utf-8") as f:
+            hot_before = f.read()
+        now = START_MS + 100 * STEP_MS
+        archive.compact(now)
+        archive.close()
+        # Power cut after the blocks were written but before the hot file
+        # was rewritten: the old hot file comes back
+        with open(hot_path, "w", encoding="utf-8") as f:
+            f.write(hot_before)
+
+        archive = ReadingArchive(directory, block_size=20, hot_seconds=60)
+        archive.compact(now)
+        result = archive.read_range(1, START_MS, now)
+        assert len(result[0]) == 100
+        archive.close()
+
+
+def test_late_reading_is_kept():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = make_archive(directory)
+        now = START_MS + 100 * STEP_MS
+        archive.compact(now)
+        late_ts = START_MS + 10 * STEP_MS + 1234   # inside compressed history
+        archive.append({"deviceId": 1, "timestamp": late_ts,
+                        "temperature": 9.5, "batteryVoltage": 3.7})
+        archive.compact(now)
+        window = (START_MS + 10 * STEP_MS, START_MS + 11 * STEP_MS)
+        assert as_lists(archive.read_range(1, *window))[0] == [window[0], late_ts, window[1]]
+        archive.close()
+
+        # Still there, and still in order, after a restart
+        archive = ReadingArchive(directory, block_size=20, hot_seconds=60)
+        timestamps = as_lists(archive.read_range(1, START_MS, now))[0]
+        assert len(timestamps) == 101
+        assert timestamps == sorted(timestamps)
+        archive.close()
+
+
+def write_blocks(path, count):
+    block_file = BlockFile(path)
+    for b in range(count):
+        ts = [START_MS + (b * 10 + i) * STEP_MS for i in range(10)]
+        block_file.append_blocks([encode_block(ts, [4.0] * 10, [3.8] * 10)])
+    return block_file
+
+
+def test_torn_tail_is_truncated():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "device-1.tsc")
+        write_blocks(path, 3)
+        good_size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(encode_block([START_MS + 10 ** 9], [4.0], [3.8])[:30])
+
+        block_file = BlockFile(path)
+        assert len(block_file) == 30
+        assert os.path.getsize(path) == good_size
+
+
+def test_damaged_block_does_not_lose_later_blocks():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "device-1.tsc")
+        first_block = write_blocks(path, 3).index[1]
+        with open(path, "r+b") as f:
+            f.seek(first_block[2])
+            f.write(b"XXXX")   # corrupt the magic of the middle block
+
+        block_file = BlockFile(path)
+        assert len(block_file) == 20
+        result = block_file.read_range(START_MS, START_MS + 30 * STEP_MS)
+        assert int(result[0][-1]) == START_MS + 29 * STEP_MS
+
+
+def test_torn_hot_line_does_not_break_history():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = make_archive(directory, readings=10)
+        archive.close()
+        with open(archive._hot_path(1), "a", encoding="utf-8") as f:
+            f.write('oops\n')                # a damaged line
+            f.write('[1700000050000, 4.')     # then a power cut mid-write
+
+        archive = ReadingArchive(directory, block_size=20, hot_seconds=60)
+        archive.append(reading(10))
+        archive.append(reading(11))
+        with open(archive._hot_path(1), encoding="utf-8") as f:
+            assert f.read().count("\n") == 13   # torn fragment cut, not glued on
+        end = START_MS + 11 * STEP_MS
+        assert len(archive.read_range(1, START_MS, end)[0]) == 12
+        archive.compact(end + 10 ** 6)
+        assert len(archive.read_range(1, START_MS, end)[0]) == 12
+        archive.close()
+
+
+class FailingClock:
+    def __init__(self, stop_event):
+        self.calls = 0
+        self.stop_event = stop_event
+
+    def time(self):
+        self.calls += 1
+        if self.calls >= 3:
+            self.stop_event.set()
+        raise OSError("SD card went away")
+
+
+def test_compaction_loop_survives_errors():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ReadingArchive(directory)
+        stop_event = threading.Event()
+        clock = FailingClock(stop_event)
+        archive.run_compaction(clock, interval=0.01, stop_event=stop_event)
+        assert clock.calls == 3
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: uplink resume/backoff checks against the stand-in server
+Run with: python -m pytest test_uplink.py
+"""
+
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from uplink import Uplink
+from uplink_server import start_server
+
+
+def endpoint_of(server):
+    return f"http://localhost:{server.server_port}/ingest"
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_resumes_from_spool_after_restart():
+    server, store = start_server(port=0)
+    try:
+        with tempfile.TemporaryDirectory() as spool:
+            uplink = Uplink(endpoint_of(server), spool, batch_size=10, segment_size=25)
+            for i in range(40):
+                uplink.enqueue("reading", {"deviceId": 1, "n": i})
+            assert uplink.send_batch() == 10
+            uplink.stop()  # gateway reboots with 30 records unsent
+
+            uplink = Uplink(endpoint_of(server), spool, batch_size=10, segment_size=25)
+            assert uplink.cursor == 10
+            assert uplink.pending() == 30
+            uplink.enqueue("reading", {"deviceId": 1, "n": 40})
+            assert uplink.flush() == 31
+            uplink.stop()
+            assert [r["data"]["n"] for r in store.records["gateway-1"]] == list(range(41))
+    finally:
+        server.shutdown()
+
+
+def test_resend_after_lost_ack_is_not_duplicated():
+    server, store = start_server(port=0)
+    try:
+        with tempfile.TemporaryDirectory() as spool:
+            uplink = Uplink(endpoint_of(server), spool, batch_size=5)
+            for i in range(5):
+                uplink.enqueue("alert", {"deviceId": 2, "n": i})
+            uplink.send_batch()
+            # Pretend the acknowledgement never arrived and send again
+            uplink.cursor = 0
+            uplink.send_batch()
+            uplink.stop()
+            assert len(store.records["gateway-1"]) == 5
+            assert store.batches == 2
+    finally:
+        server.shutdown()
+
+
+class EmptyOkHandler(BaseHTTPRequestHandler):
+    """200 with no body, like a captive portal or a misbehaving proxy"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_empty_200_does_not_move_the_cursor():
+    server = ThreadingHTTPServer(("localhost", 0), EmptyOkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as spool:
+            uplink = Uplink(endpoint_of(server), spool, batch_size=10, segment_size=10)
+            for i in range(25):
+                uplink.enqueue("reading", {"deviceId": 1, "n": i})
+            with pytest.raises(ValueError):
+                uplink.flush()
+            assert uplink.cursor == 0
+            assert uplink.pending() == 25
+            assert len(uplink._segments()) == 3
+            uplink.stop()
+    finally:
+        server.shutdown()
+
+
+def test_backoff_grows_and_is_capped():
+    uplink = Uplink("http://localhost:1/ingest", tempfile.mkdtemp(), max_backoff=60)
+    delays = []
+    for failures in (1, 3, 20):
+        uplink.failures = failures
+        delays.append(uplink.backoff_delay())
+    assert 1 <= delays[0] <= 2
+    assert 4 <= delays[1] <= 8
+    assert 30 <= delays[2] <= 60
+
+
+class BadAckHandler(BaseHTTPRequestHandler):
+    """Answers 200 with a body that is not an acknowledgement, then a truncated one"""
+    calls = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        BadAckHandler.calls += 1
+        self.send_response(200)
+        if BadAckHandler.calls % 2:
+            body = b"[1, 2, 3]"
+            self.send_header("Content-Length", str(len(body)))
+        else:
+            body = b'{"acked_seq"'
+            self.send_header("Content-Length", "100")  # connection drops early
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_sender_survives_bad_responses():
+    server = ThreadingHTTPServer(("localhost", 0), BadAckHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as spool:
+            uplink = Uplink(endpoint_of(server), spool, max_backoff=0.05, timeout=2)
+            uplink.enqueue("reading", {"deviceId": 3})
+            thread = uplink.start()
+            assert wait_for(lambda: uplink.failures >= 4)
+            assert thread.is_alive()
+            assert uplink.cursor == 0
+            uplink.stop()
+            thread.join(2)
+    finally:
+        server.shutdown()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Time-Series Codec
+Compact storage for temperature/voltage history on the gateway SD card.
+
+Timestamps are stored as delta-of-delta (0 for a steady SENSOR_INTERVAL
+cadence) and values as fixed-point deltas, each packed at the smallest
+integer width that fits the block. Decoding is a couple of cumulative sums,
+vectorized with NumPy when it is installed.
+"""
+
+import bisect
+import json
+import os
+import struct
+import threading
+import zlib
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python decode still works, just slower
+    np = None
+
+MAGIC = b"TSB1"
+# magic, count, flags, ts_width, temp_width, volt_width, payload_len,
+# first_ts, last_ts, first_delta, first_temp, first_volt
+HEADER = struct.Struct("<4sHBBBBIqqqii")
+FLAG_ZLIB = 1
+
+TEMP_SCALE = 100    # 0.01°C
+VOLT_SCALE = 1000   # 1 mV
+
+WIDTH_TYPECODES = {1: "b", 2: "h", 4: "i", 8: "q"}
+WIDTH_DTYPES = {1: "<i1", 2: "<i2", 4: "<i4", 8: "<i8"}
+
+
+def _width(values):
+    """Smallest signed integer width (0 when every value is zero)"""
+    if not values:
+        return 0
+    low, high = min(values), max(values)
+    if low == 0 and high == 0:
+        return 0
+    for width in (1, 2, 4):
+        limit = 1 << (8 * width - 1)
+        if -limit <= low and high < limit:
+            return width
+    return 8
+
+
+def _pack(values, width):
+    if width == 0:
+        return b""
+    return struct.pack(f"<{len(values)}{WIDTH_TYPECODES[width]}", *values)
+
+
+def _diffs(values):
+    return [b - a for a, b in zip(values, values[1:])]
+
+
+def encode_block(timestamps, temperatures, voltages):
+    """
+    Encode one block of readings (timestamps in ms, must be ascending).
+    Returns the block bytes, header included.
+    """
+    count = len(timestamps)
+    if count == 0 or count > 0xFFFF:
+        raise ValueError(f"block must hold 1..65535 readings, got {count}")
+
+    temps = [round(t * TEMP_SCALE) for t in temperatures]
+    volts = [round(v * VOLT_SCALE) for v in voltages]
+    deltas = _diffs(timestamps)
+    dods = _diffs(deltas)
+    temp_deltas = _diffs(temps)
+    volt_deltas = _diffs(volts)
+
+    widths = [_width(dods), _width(temp_deltas), _width(volt_deltas)]
+    payload = (_pack(dods, widths[0]) + _pack(temp_deltas, widths[1])
+               + _pack(volt_deltas, widths[2]))
+    flags = 0
+    compressed = zlib.compress(payload, 6)
+    if len(compressed) < len(payload):
+        payload = compressed
+        flags |= FLAG_ZLIB
+
+    header = HEADER.pack(MAGIC, count, flags, widths[0], widths[1], widths[2],
+                         len(payload), timestamps[0], timestamps[-1],
+                         deltas[0] if deltas else 0, temps[0], volts[0])
+    return header + payload
+
+
+def _unpack(buffer, offset, width, count):
+    """Read count integers of the given width, returns (values, new offset)"""
+    if width == 0:
+        if np is not None:
+            return np.zeros(count, dtype=np.int64), offset
+        return [0] * count, offset
+    end = offset + width * count
+    if np is not None:
+        values = np.frombuffer(buffer, dtype=WIDTH_DTYPES[width], count=count,
+                               offset=offset).astype(np.int64)
+    else:
+        values = list(struct.unpack_from(f"<{count}{WIDTH_TYPECODES[width]}", buffer, offset))
+    return values, end
+
+
+def decode_block(block):
+    """
+    Decode one block into (timestamps_ms, temperatures, voltages). With NumPy
+    these are int64/float64 arrays, otherwise lists.
+    """
+    (magic, count, flags, ts_width, temp_width, volt_width, payload_len,
+     first_ts, _last_ts, first_delta, first_temp, first_volt) = HEADER.unpack_from(block)
+    if magic != MAGIC:
+        raise ValueError("not a Solar-Surv time-series block")
+    payload = block[HEADER.size:HEADER.size + payload_len]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+
+    dods, offset = _unpack(payload, 0, ts_width, max(0, count - 2))
+    temp_deltas, offset = _unpack(payload, offset, temp_width, count - 1)
+    volt_deltas, offset = _unpack(payload, offset, volt_width, count - 1)
+
+    if np is not None:
+        deltas = np.empty(count, dtype=np.int64)
+        deltas[0] = 0
+        if count > 1:
+            deltas[1] = first_delta
+            deltas[2:] = dods
+            np.cumsum(deltas[1:], out=deltas[1:])
+        timestamps = first_ts + np.cumsum(deltas)
+        temps = np.concatenate(([first_temp], temp_deltas)).cumsum() / TEMP_SCALE
+        volts = np.concatenate(([first_volt], volt_deltas)).cumsum() / VOLT_SCALE
+        return timestamps, temps, volts
+
+    deltas = list(accumulate([first_delta] + list(dods))) if count > 1 else []
+    timestamps = list(accumulate([first_ts] + deltas))
+    temps = [t / TEMP_SCALE for t in accumulate([first_temp] + temp_deltas)]
+    volts = [v / VOLT_SCALE for v in accumulate([first_volt] + volt_deltas)]
+    return timestamps, temps, volts
+
+
+class BlockFile:
+    """
+    Append-only file of encoded blocks. Only block headers are read to build
+    the index, so a range query seeks straight to the blocks it needs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = []        # (first_ts, last_ts, offset, length, count)
+        self.first_ts = []     # for bisect
+        self.last_ts_list = []
+        self.late = []         # blocks of late readings, in file order
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            offset = 0
+            while offset + HEADER.size <= size:
+                f.seek(offset)
+                header = HEADER.unpack(f.read(HEADER.size))
+                length = HEADER.size + header[6]
+                if _plausible(header) and offset + length <= size:
+                    self._add_to_index(header[7], header[8], offset, length, header[1])
+                    offset += length
+                    continue
+                # Either a torn block at the end (power cut) or a damaged one
+                # in the middle; only the former may be cut off
+                f.seek(offset + 1)
+                next_block = f.read().find(MAGIC)
+                if next_block < 0:
+                    break
+                print(f"⚠️ {self.path}: skipping {next_block + 1} damaged bytes at {offset}")
+                offset += 1 + next_block
+        if offset < size:
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+
+    def _add_to_index(self, first_ts, last_ts, offset, length, count):
+        entry = (first_ts, last_ts, offset, length, count)
+        if self.index and first_ts <= self.index[-1][1]:
+            # Late readings: their block overlaps history, keep it aside
+            self.late.append(entry)
+            return
+        self.index.append(entry)
+        self.first_ts.append(first_ts)
+        self.last_ts_list.append(last_ts)
+
+    @property
+    def last_ts(self):
+        return self.index[-1][1] if self.index else None
+
+    def __len__(self):
+        return sum(entry[4] for entry in self.index + self.late)
+
+    def append_blocks(self, blocks):
+        """
+        Append encoded blocks and fsync. Blocks should be in time order;
+        one that overlaps earlier history is indexed as a late block.
+        """
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            for block in blocks:
+                f.write(block)
+                header = HEADER.unpack_from(block)
+                self._add_to_index(header[7], header[8], offset, len(block), header[1])
+                offset += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def blocks_between(self, start_ts, end_ts):
+        """Index entries for blocks overlapping [start_ts, end_ts]"""
+        # Blocks are in time order and do not overlap; late blocks are rare
+        # and checked one by one
+        start = bisect.bisect_left(self.last_ts_list, start_ts)
+        stop = bisect.bisect_right(self.first_ts, end_ts)
+        late = [e for e in self.late if e[0] <= end_ts and e[1] >= start_ts]
+        return self.index[start:stop] + late
+
+    def read_range(self, start_ts, end_ts):
+        """Decode only the blocks covering the range, then trim to it"""
+        entries = self.blocks_between(start_ts, end_ts)
+        if not entries:
+            return _empty()
+        parts = []
+        with open(self.path, "rb") as f:
+            for _, _, offset, length, _ in entries:
+                f.seek(offset)
+                parts.append(decode_block(f.read(length)))
+        return _trim(parts, start_ts, end_ts)
+
+
+def _plausible(header):
+    """Sanity check a block header before trusting its length"""
+    widths = set(WIDTH_TYPECODES) | {0}
+    return (header[0] == MAGIC and header[1] > 0 and header[7] <= header[8]
+            and header[3] in widths and header[4] in widths and header[5] in widths)
+
+
+def _empty():
+    if np is not None:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    return [], [], []
+
+
+def _trim(parts, start_ts, end_ts):
+    if np is not None:
+        timestamps = np.concatenate([p[0] for p in parts])
+        temps = np.concatenate([p[1] for p in parts])
+        volts = np.concatenate([p[2] for p in parts])
+        mask = (timestamps >= start_ts) & (timestamps <= end_ts)
+        timestamps, temps, volts = timestamps[mask], temps[mask], volts[mask]
+        if len(timestamps) > 1 and (np.diff(timestamps) < 0).any():
+            # Late readings came from their own blocks
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, temps, volts = timestamps[order], temps[order], volts[order]
+        return timestamps, temps, volts
+    rows = [(t, temp, volt) for ts, temps, volts in parts
+            for t, temp, volt in zip(ts, temps, volts) if start_ts <= t <= end_ts]
+    rows.sort(key=lambda r: r[0])
+    return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+
+
+class ReadingArchive:
+    """
+    Per-device reading history. New readings go to a small raw "hot" file;
+    compact() (run from a background thread) moves older hot readings into
+    compressed blocks.
+    """
+
+    def __init__(self, directory, block_size=720, hot_seconds=3600):
+        self.directory = directory
+        self.block_size = block_size          # 720 readings = 1 hour at 5 s
+        self.hot_seconds = hot_seconds        # keep the last hour uncompressed
+        self.lock = threading.Lock()
+        self.block_files = {}
+        self.hot_files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _block_file(self, device_id):
+        if device_id not in self.block_files:
+            path = os.path.join(self.directory, f"device-{device_id}.tsc")
+            self.block_files[device_id] = BlockFile(path)
+        return self.block_files[device_id]
+
+    def _hot_path(self, device_id):
+        return os.path.join(self.directory, f"device-{device_id}.hot.jsonl")
+
+    def append(self, device_data):
+        """Store one LoRa reading"""
+        device_id = device_data["deviceId"]
+        row = [device_data["timestamp"], device_data["temperature"],
+               device_data["batteryVoltage"]]
+        with self.lock:
+            hot = self.hot_files.get(device_id)
+            if hot is None:
+                self._truncate_torn_hot(device_id)
+                hot = open(self._hot_path(device_id), "a", encoding="utf-8")
+                self.hot_files[device_id] = hot
+            hot.write(json.dumps(row) + "\n")
+            hot.flush()
+
+    def _truncate_torn_hot(self, device_id):
+        """Cut a half-written last line (power cut) so new rows start clean"""
+        path = self._hot_path(device_id)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        if data and not data.endswith(b"\n"):
+            with open(path, "r+b") as f:
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _read_hot(self, device_id):
+        rows = []
+        path = self._hot_path(device_id)
+        if not os.path.exists(path):
+            return rows
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    continue  # torn by a power cut
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # damaged line, keep the rest of the history
+                if isinstance(row, list) and len(row) == 3:
+                    rows.append(row)
+        return rows
+
+    def devices(self):
+        ids = set()
+        for name in os.listdir(self.directory):
+            if name.startswith("device-"):
+                ids.add(int(name[len("device-"):].split(".")[0]))
+        return sorted(ids)
+
+    def compact(self, now_ms):
+        """Compress hot readings older than hot_seconds, returns readings moved"""
+        moved = 0
+        cutoff = now_ms - self.hot_seconds * 1000
+        for device_id in self.devices():
+            with self.lock:
+                block_file = self._block_file(device_id)
+                rows = self._read_hot(device_id)
+                hot_count = len(rows)
+                late = []
+                if block_file.last_ts is not None:
+                    late = [r for r in rows if r[0] <= block_file.last_ts]
+                    rows = [r for r in rows if r[0] > block_file.last_ts]
+                late = self._new_late_rows(block_file, late)
+                duplicates = hot_count - len(rows) - len(late)
+                rows.sort(key=lambda r: r[0])
+                old = [r for r in rows if r[0] < cutoff]
+                keep = rows[len(old):]
+                # Write full blocks only, unless the device has gone quiet
+                full = len(old) - len(old) % self.block_size
+                if old and old[-1][0] < cutoff - self.hot_seconds * 1000:
+                    full = len(old)
+                if not full and not late and not duplicates:
+                    continue
+                keep = old[full:] + keep
+                old = old[:full]
+
+                # Late rows go first as their own blocks so the rest still
+                # extends the in-order history
+                blocks = self._encode_blocks(late) + self._encode_blocks(old)
+                block_file.append_blocks(blocks)
+                if late:
+                    print(f"⚠️ Device {device_id}: {len(late)} late readings archived "
+                          f"out of order")
+
+                hot = self.hot_files.pop(device_id, None)
+                if hot is not None:
+                    hot.close()
+                tmp_path = self._hot_path(device_id) + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for row in keep:
+                        f.write(json.dumps(row) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self._hot_path(device_id))
+                moved += len(old) + len(late)
+        return moved
+
+    def _encode_blocks(self, rows):
+        blocks = []
+        for i in range(0, len(rows), self.block_size):
+            chunk = rows[i:i + self.block_size]
+            blocks.append(encode_block([r[0] for r in chunk], [r[1] for r in chunk],
+                                       [r[2] for r in chunk]))
+        return blocks
+
+    @staticmethod
+    def _new_late_rows(block_file, rows):
+        """
+        Hot rows timestamped inside compressed history. Exact timestamps
+        already in blocks were copied before a crash mid-compaction and are
+        dropped; the rest are genuinely late readings.
+        """
+        if not rows:
+            return []
+        rows.sort(key=lambda r: r[0])
+        stored, _, _ = block_file.read_range(rows[0][0], rows[-1][0])
+        stored = set(int(t) for t in stored)
+        late = []
+        for row in rows:
+            if row[0] not in stored:
+                stored.add(row[0])
+                late.append(row)
+        return late
+
+    def read_range(self, device_id, start_ts, end_ts):
+        """(timestamps_ms, temperatures, voltages) for one device in a range"""
+        with self.lock:
+            compressed = self._block_file(device_id).read_range(start_ts, end_ts)
+            hot = [r for r in self._read_hot(device_id) if start_ts <= r[0] <= end_ts]
+        if not hot:
+            return compressed
+        if np is not None:
+            hot_arrays = (np.array([r[0] for r in hot], dtype=np.int64),
+                          np.array([r[1] for r in hot], dtype=float),
+                          np.array([r[2] for r in hot], dtype=float))
+            return _trim([compressed, hot_arrays], start_ts, end_ts)
+        return _trim([compressed, ([r[0] for r in hot], [r[1] for r in hot],
+                                   [r[2] for r in hot])], start_ts, end_ts)
+
+    def run_compaction(self, clock, interval=600, stop_event=None):
+        """Background loop: compact every interval seconds until stop_event is set"""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.wait(interval):
+            try:
+                self.compact(int(clock.time() * 1000))
+            except Exception as e:
+                # One bad file must not stop compaction for the whole process
+                print(f"⚠️ History compaction failed ({e}), retrying in {interval}s")
+
+    def close(self):
+        with self.lock:
+            for hot in self.hot_files.values():
+                hot.close()
+            self.hot_files.clear()
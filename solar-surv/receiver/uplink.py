@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Central Server Uplink
+Batches readings and alerts, gzips them and posts them to a central server.
+A durable spool and cursor let the gateway resume exactly where it stopped.
+"""
+
+import gzip
+import http.client
+import json
+import os
+import random
+import threading
+import urllib.error
+import urllib.request
+
+SEGMENT_PREFIX = "spool-"
+CURSOR_FILE = "cursor.json"
+
+
+class Uplink:
+    """
+    Records are appended to numbered spool segments on disk. A sender thread
+    posts them in order, one batch at a time, and only moves the cursor once
+    the server has acknowledged the batch. Fully sent segments are deleted.
+
+    Every record has a sequence number; the server uses it to ignore batches
+    it has already stored, so resending after a lost acknowledgement is safe.
+    """
+
+    def __init__(self, endpoint, spool_dir, gateway_id="gateway-1", batch_size=500,
+                 segment_size=5000, flush_interval=30, max_backoff=600, timeout=15):
+        self.endpoint = endpoint
+        self.spool_dir = spool_dir
+        self.gateway_id = gateway_id
+        self.batch_size = batch_size
+        self.segment_size = segment_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.failures = 0
+        self.sent_batches = 0
+        self.bytes_sent = 0
+
+        os.makedirs(spool_dir, exist_ok=True)
+        self.cursor = self._load_cursor()  # last seq acknowledged by the server
+        self.next_seq = self._recover_next_seq()
+        self._segment = None
+        self._segment_start = None
+
+    # ------------------------------------------------------------------
+    # Spool
+
+    def enqueue(self, kind, record):
+        """Add a reading/alert to the spool, returns its sequence number"""
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            segment_start = seq - (seq - 1) % self.segment_size
+            if self._segment is None or segment_start != self._segment_start:
+                if self._segment is not None:
+                    self._segment.close()
+                self._segment = open(self._segment_path(segment_start), "a", encoding="utf-8")
+                self._segment_start = segment_start
+            self._segment.write(json.dumps({"seq": seq, "kind": kind, "data": record}) + "\n")
+            self._segment.flush()
+            pending = seq - self.cursor
+        if pending >= self.batch_size:
+            self.wakeup.set()
+        return seq
+
+    def pending(self):
+        return self.next_seq - 1 - self.cursor
+
+    def _segment_path(self, start):
+        return os.path.join(self.spool_dir, f"{SEGMENT_PREFIX}{start:012d}.jsonl")
+
+    def _segments(self):
+        """Spool segment start sequence numbers, oldest first"""
+        starts = []
+        for name in os.listdir(self.spool_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(".jsonl"):
+                starts.append(int(name[len(SEGMENT_PREFIX):-len(".jsonl")]))
+        return sorted(starts)
+
+    def _read_batch(self):
+        """Up to batch_size spooled records after the cursor"""
+        batch = []
+        for start in self._segments():
+            if start + self.segment_size - 1 <= self.cursor:
+                continue
+            with open(self._segment_path(start), "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # still being written, or torn by a power cut
+                    record = json.loads(line)
+                    if record["seq"] <= self.cursor:
+                        continue
+                    batch.append(record)
+                    if len(batch) >= self.batch_size:
+                        return batch
+        return batch
+
+    def _recover_next_seq(self):
+        segments = self._segments()
+        if not segments:
+            return self.cursor + 1
+        last_seq = self.cursor
+        path = self._segment_path(segments[-1])
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+                last_seq = max(last_seq, json.loads(line)["seq"])
+        if os.path.getsize(path) > valid_bytes:
+            with open(path, "r+b") as f:
+                f.truncate(valid_bytes)
+        return last_seq + 1
+
+    def _drop_sent_segments(self):
+        for start in self._segments():
+            if start + self.segment_size - 1 <= self.cursor and start != self._segment_start:
+                os.remove(self._segment_path(start))
+
+    # ------------------------------------------------------------------
+    # Cursor
+
+    def _load_cursor(self):
+        path = os.path.join(self.spool_dir, CURSOR_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["acked_seq"]
+
+    def _save_cursor(self):
+        path = os.path.join(self.spool_dir, CURSOR_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"acked_seq": self.cursor}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------------
+    # Sending
+
+    def send_batch(self):
+        """
+        Post one batch. Returns how far the cursor advanced (0 when there is
+        nothing to send) and raises on network/server errors.
+        """
+        batch = self._read_batch()
+        if not batch:
+            return 0
+        payload = {
+            "gateway": self.gateway_id,
+            "first_seq": batch[0]["seq"],
+            "last_seq": batch[-1]["seq"],
+            "records": batch,
+        }
+        body = gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        request = urllib.request.Request(self.endpoint, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "X-Gateway-Id": self.gateway_id,
+        })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            ack = json.loads(response.read())  # an empty body is not an acknowledgement
+        # Anything short of an explicit acked_seq (a proxy or captive portal
+        # page, say) must not move the cursor
+        acked = ack.get("acked_seq") if isinstance(ack, dict) else None
+        if not isinstance(acked, int) or isinstance(acked, bool):
+            raise ValueError(f"bad acknowledgement {ack!r}")
+
+        # The server tells us how far it has stored; never move backwards
+        acked = min(acked, payload["last_seq"])
+        advanced = max(0, acked - self.cursor)
+        if advanced:
+            self.cursor = acked
+            self._save_cursor()
+            self._drop_sent_segments()
+        self.sent_batches += 1
+        self.bytes_sent += len(body)
+        return advanced
+
+    def flush(self):
+        """Send everything that is spooled, returns records sent"""
+        sent = 0
+        while True:
+            count = self.send_batch()
+            if count == 0:
+                return sent
+            sent += count
+
+    def backoff_delay(self):
+        """Exponential backoff with jitter after consecutive failures"""
+        delay = min(self.max_backoff, 2 ** min(self.failures, 16))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def run(self):
+        """Sender loop, meant for a daemon thread"""
+        self.running = True
+        while self.running:
+            try:
+                self.flush()
+                self.failures = 0
+                self.wakeup.wait(self.flush_interval)
+            except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+                self.failures += 1
+                delay = self.backoff_delay()
+                print(f"Uplink failed ({e}), {self.pending()} records pending, "
+                      f"retrying in {delay:.0f}s")
+                self.wakeup.wait(delay)
+            self.wakeup.clear()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        with self.lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+                self._segment_start = None
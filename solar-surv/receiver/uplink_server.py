@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Solar-Surv: Central Server Stand-in
+Minimal ingest endpoint for testing the gateway uplink locally
+"""
+
+import gzip
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class IngestStore:
+    """Stores uplinked records once per gateway, whatever gets resent"""
+
+    def __init__(self, keep_records=True):
+        self.keep_records = keep_records  # False: only track sequence numbers
+        self.lock = threading.Lock()
+        self.acked_seq = {}   # gateway -> highest contiguous seq stored
+        self.records = {}     # gateway -> list of records
+        self.batches = 0
+
+    def ingest(self, payload):
+        gateway = payload["gateway"]
+        with self.lock:
+            # A gateway we have not seen before starts wherever its spool starts
+            acked = self.acked_seq.get(gateway, payload["first_seq"] - 1)
+            stored = self.records.setdefault(gateway, [])
+            for record in payload["records"]:
+                if record["seq"] == acked + 1:
+                    if self.keep_records:
+                        stored.append(record)
+                    acked = record["seq"]
+            self.acked_seq[gateway] = acked
+            self.batches += 1
+            return acked
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    store = None
+    fail_rate = 0.0   # fraction of requests answered with 503, to test retries
+
+    def do_POST(self):
+        if self.path != "/ingest":
+            self.send_error(404)
+            return
+        if random.random() < self.fail_rate:
+            self.send_error(503, "Simulated outage")
+            return
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            payload = json.loads(body)
+            acked = self.store.ingest(payload)
+        except (ValueError, KeyError, OSError) as e:
+            self.send_error(400, f"Bad batch: {e}")
+            return
+
+        reply = json.dumps({"acked_seq": acked}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host="localhost", port=8780, fail_rate=0.0, keep_records=True):
+    """Start the stand-in server on a background thread, returns (server, store)"""
+    store = IngestStore(keep_records)
+    handler = type("Handler", (IngestHandler,), {"store": store, "fail_rate": fail_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, store
+
+
+def main():
+    server, store = start_server()
+    print(f"Central server stand-in listening on http://localhost:{server.server_port}/ingest")
+    print("Press Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for gateway, acked in store.acked_seq.items():
+            print(f"{gateway}: {acked} records stored")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
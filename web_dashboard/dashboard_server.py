@@ -5,23 +5,86 @@ Serves the SMS monitoring dashboard with real-time updates
 """
 
 import http.server
+import json
+import os
 import socketserver
+import sys
 import webbrowser
 import threading
 import time
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sms_system'))
+from sms_store import SMSStore
+
+SMS_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sms_system', 'sms_inbox.log')
+
+
+class DashboardRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static files plus a small JSON API over the SMS store"""
+    store = None
+    store_lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/api/sms':
+            self.send_sms_page(parse_qs(url.query))
+        else:
+            super().do_GET()
+
+    def send_sms_page(self, params):
+        """GET /api/sms?device=1&type=temperature_hot&read=0&direction=inbox&since=...&page=2"""
+        def param(name):
+            values = params.get(name)
+            return values[0] if values else None
+
+        try:
+            read = param('read')
+            since = param('since')
+            until = param('until')
+            device = param('device')
+            with self.store_lock:
+                self.store.refresh()
+                result = self.store.query(
+                    device_id=int(device) if device is not None else None,
+                    alert_type=param('type'),
+                    read=None if read is None else read in ('1', 'true'),
+                    direction=param('direction'),
+                    since=datetime.fromisoformat(since) if since else None,
+                    until=datetime.fromisoformat(until) if until else None,
+                    page=param('page') or 1,
+                    page_size=param('page_size') or 20,
+                )
+                body = json.dumps({
+                    **result,
+                    'items': [SMSStore.serialize(sms) for sms in result['items']],
+                    'unread': self.store.unread_count(),
+                }).encode('utf-8')
+        except (ValueError, TypeError, KeyError) as e:
+            self.send_error(400, f"Bad query: {e}")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
 
 class DashboardServer:
-    def __init__(self, port=8080):
+    def __init__(self, port=8080, sms_log_path=SMS_LOG_PATH):
         self.port = port
         self.running = False
+        DashboardRequestHandler.store = SMSStore(sms_log_path, readonly=True)
         
     def start_server(self):
         """Start the web server"""
-        handler = http.server.SimpleHTTPRequestHandler
-        with socketserver.TCPServer(("", self.port), handler) as httpd:
+        handler = DashboardRequestHandler
+        with socketserver.ThreadingTCPServer(("", self.port), handler) as httpd:
             print(f"🌐 Dashboard server started on http://localhost:{self.port}")
             print(f"�� Open http://localhost:{self.port}/sms_dashboard.html in your browser")
+            print(f"📨 SMS API: http://localhost:{self.port}/api/sms?page=1")
             print("Press Ctrl+C to stop")
             self.running = True
             try: